@@ -0,0 +1,91 @@
+"""
+measure the batched I/O of memorpy3 against a local child process, and check that what is read and
+written matches the memory of the child
+
+    python bench_io.py [--size 16] [--ranges 5000]
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+from memorpy3.MemWorker import MemWorker
+
+# the child fills a buffer with a known pattern, prints its address and waits to be killed
+CHILD = """
+import ctypes, sys
+size = int(sys.argv[1])
+buf = (ctypes.c_ubyte * size).from_buffer(bytearray(bytes(range(256)) * (size // 256)))
+print(ctypes.addressof(buf), flush=True)
+sys.stdin.readline()
+"""
+
+
+def timed(label, size, function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    print("%-40s %8.1f ms %10.1f MiB/s" % (label, elapsed * 1000, size / (1 << 20) / max(elapsed, 1e-9)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=16, help="size of the buffer of the child, in MiB")
+    parser.add_argument("--ranges", type=int, default=5000, help="number of scattered ranges read and written")
+    options = parser.parse_args()
+
+    size = options.size << 20
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD, str(size)], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    try:
+        base = int(child.stdout.readline())
+        mw = MemWorker(pid=child.pid)
+        process = mw.process
+        expected = bytes(range(256)) * (size // 256)
+        failures = 0
+
+        data = timed("read_bytes (whole buffer)", size, process.read_bytes, base, size)
+        failures += data != expected
+
+        rng = np.random.default_rng(0)
+        offsets = np.sort(rng.choice(size - 16, options.ranges, replace=False)).tolist()
+        ranges = [(base + offset, 16) for offset in offsets]
+        datas = timed("read_ranges (%d x 16 bytes)" % len(ranges), 16 * len(ranges), process.read_ranges, ranges)
+        failures += sum(data != expected[offset: offset + 16] for offset, data in zip(offsets, datas))
+
+        # count the batches read_many hands to read_ranges
+        calls = []
+        read_ranges = process.read_ranges
+        process.read_ranges = lambda ranges, *args, **kwargs: calls.append(len(ranges)) or read_ranges(ranges, *args, **kwargs)
+        requests = [(base + offset, "uint") for offset in offsets]
+        values = timed("read_many (%d uint)" % len(requests), 4 * len(requests), process.read_many, requests)
+        del process.read_ranges
+        print("%-40s %8d calls" % ("read_many -> read_ranges", len(calls)))
+        failures += sum(
+            value != int.from_bytes(expected[offset: offset + 4], "little") for offset, value in zip(offsets, values)
+        )
+
+        writes = [(base + offset, b"\xAA" * 8) for offset in offsets]
+        status = timed("write_ranges (%d x 8 bytes)" % len(writes), 8 * len(writes), process.write_ranges, writes)
+        failures += status.count(False)
+        data = process.read_bytes(base, size)
+        failures += sum(data[offset: offset + 8] != b"\xAA" * 8 for offset in offsets)
+
+        writes = [(base + offset, b"\x55" * 4) for offset in offsets]
+        status = timed("write_many (%d x 4 bytes)" % len(writes), 4 * len(writes), process.write_many, writes)
+        failures += status.count(False)
+        failures += sum(process.read_bytes(base + offset, 4) != b"\x55" * 4 for offset in offsets[:100])
+
+        print("%d mismatches" % failures)
+        return 1 if failures else 0
+    finally:
+        child.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
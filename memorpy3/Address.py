@@ -48,6 +48,10 @@ class Address:
                 self.value, data_type=data_type, max_len=max_len, errors=errors
             )
 
+    def read_into(self, buffer):
+        """ fill a writable buffer with the memory at this address, return the number of bytes read """
+        return self.process.read_into(self.value, buffer)
+
     def write(self, data, data_type=None):
         if not data_type:
             data_type = self.default_type
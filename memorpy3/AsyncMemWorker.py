@@ -0,0 +1,143 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import functools
+import threading
+
+from .MemWorker import MemWorker
+
+# number of results a scan may run ahead of its consumer
+MAX_PENDING = 256
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class AsyncMemWorker:
+    """
+    asyncio front-end of MemWorker, reads and scans run in an executor (the default thread pool of
+    the loop unless one is given) so they never block the event loop
+
+    searches are async generators fed by a scan running in a worker thread, the scan waits once
+    max_pending results are waiting for the consumer, and stops before its next chunk read when the
+    consumer breaks out of the loop or its task is cancelled
+    """
+
+    def __init__(self, pid=None, name=None, mw=None, executor=None, max_pending=MAX_PENDING, **kwargs):
+        self.mw = mw if mw is not None else MemWorker(pid=pid, name=name, **kwargs)
+        self.process = self.mw.process
+        self.executor = executor
+        self.max_pending = max_pending
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    async def close(self):
+        return await self._run(self.process.close)
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def read(self, address, data_type="uint", **kwargs):
+        return await self._run(self.process.read, address, data_type, **kwargs)
+
+    async def read_bytes(self, address, length=4):
+        return await self._run(self.process.read_bytes, address, length)
+
+    async def read_many(self, requests, **kwargs):
+        return await self._run(self.process.read_many, list(requests), **kwargs)
+
+    async def write(self, address, data, data_type="uint"):
+        return await self._run(self.process.write, address, data, data_type)
+
+    async def write_bytes(self, address, data):
+        return await self._run(self.process.write_bytes, address, data)
+
+    async def write_many(self, writes):
+        return await self._run(self.process.write_many, list(writes))
+
+    async def _iterate(self, scan, *args, **kwargs):
+        """ run the generator function scan(*args, cancel=event, **kwargs) in the executor and yield its results """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.max_pending)
+        cancel = threading.Event()
+
+        def put(item):
+            # blocks the scan while the queue is full
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def produce():
+            try:
+                for result in scan(*args, cancel=cancel, **kwargs):
+                    if cancel.is_set():
+                        return
+                    put(result)
+            except Exception as e:
+                if not cancel.is_set():
+                    put(_Failure(e))
+                return
+            if not cancel.is_set():
+                put(_DONE)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exception
+                yield item
+        finally:
+            cancel.set()
+            # unblock a scan waiting on a full queue, it sees cancel right after
+            while not queue.empty():
+                queue.get_nowait()
+            if producer.done() and not producer.cancelled():
+                producer.exception()
+
+    def mem_search(self, value, ftype="match", **kwargs):
+        """ async iterator over the results of MemWorker.mem_search """
+        return self._iterate(self.mw.mem_search, value, ftype, **kwargs)
+
+    def umem_search(self, regex, **kwargs):
+        """ async iterator over the results of MemWorker.umem_search """
+        return self._iterate(self.mw.umem_search, regex, **kwargs)
+
+    def str_search(self, text, **kwargs):
+        """ async iterator over the results of MemWorker.str_search """
+        return self._iterate(self.mw.str_search, text, **kwargs)
+
+    def extract_strings(self, min_len=4, **kwargs):
+        """ async iterator over the strings of MemWorker.extract_strings """
+        return self._iterate(self.mw.extract_strings, min_len, **kwargs)
+
+    def mem_scan(self, value, ftype="uint", **kwargs):
+        """ async iterator over the address arrays of MemWorker.mem_scan """
+        return self._iterate(self.mw.mem_scan, value, ftype, **kwargs)
+
+    def sig_search(self, signatures, **kwargs):
+        """ async iterator over the results of MemWorker.sig_search """
+        return self._iterate(self.mw.sig_search, signatures, **kwargs)
@@ -2,10 +2,13 @@
 # -*- coding: UTF8 -*-
 
 import struct
+import functools
 from typing import Union
 
 from .Address import Address
-from .utils import type_unpack
+from .RegionMap import RegionMap, ModuleMap
+from .ReadPlan import ReadPlan
+from .utils import type_unpack, value_decoder, decode_value, merge_writes, PAGE_SIZE
 
 """ Base class for process not linked to any platform """
 
@@ -22,6 +25,8 @@ class BaseProcess:
         self.isProcessOpen = False
         self.buffer = None
         self.buffer_len = 0
+        self.region_map = RegionMap(self)
+        self.module_map = ModuleMap(self)
 
     def __del__(self):
         self.close()
@@ -29,17 +34,125 @@ class BaseProcess:
     def close(self):
         pass
 
-    def iter_region(self, *args, **kwargs):
+    def opener(self):
+        """ return a picklable callable opening a new handle on the same process, for worker threads and processes """
+        return functools.partial(type(self), pid=self.pid)
+
+    def query_regions(self):
+        """ walk the address space and return a list of RegionMap.Region """
         raise NotImplementedError
 
+    def iter_region(
+        self, start_offset=None, end_offset=None, protec=None, optimizations=None, scope=None, module=None
+    ):
+        """
+        yield (offset, size) of the committed regions, served from the cached region map
+
+        scope and module restrict the regions like RegionMap.filter, optimizations is a string of the kinds
+        of regions to skip: "i" images, "m" mapped files, "p" private memory, "s" thread stacks
+        """
+        skip = set()
+        for letter, kind in (("i", "image"), ("m", "mapped"), ("p", "heap"), ("p", "stack"), ("s", "stack")):
+            if optimizations and letter in optimizations:
+                skip.add(kind)
+
+        for region in self.region_map.filter(
+            protec=protec, start=start_offset, end=end_offset, scope=scope, module=module
+        ):
+            if region.kind in skip:
+                continue
+            yield region.base, region.size
+
     def write_bytes(self, address, data):
         raise NotImplementedError
 
+    def write_ranges(self, ranges):
+        """
+        write many (address, data) ranges, return a list of booleans telling which writes succeeded,
+        backends override it to write all the ranges with a few calls
+        """
+        status = []
+        for address, data in ranges:
+            try:
+                status.append(bool(self.write_bytes(int(address), data)))
+            except (ProcessException, OSError):
+                status.append(False)
+        return status
+
+    def write_many(self, writes):
+        """
+        write many (address, data) at once, return a list of booleans telling which writes succeeded
+
+        adjacent and overlapping writes are merged (the last one wins where they overlap) so
+        thousands of small writes only cost a few range writes
+        """
+        merged = merge_writes(writes)
+        status = [False] * len(writes)
+        for (_, _, indexes), success in zip(merged, self.write_ranges([(address, data) for address, data, _ in merged])):
+            for index in indexes:
+                status[index] = success
+        return status
+
     def read_bytes(self, address, length=4):
         raise NotImplementedError
 
+    def read_ranges(self, ranges):
+        """
+        read many (address, length) ranges, return a list of bytes in the same order, an unreadable range
+        is returned truncated to what could be read (possibly empty). Backends able to scatter reads
+        override it to read all the ranges with a few calls
+        """
+        datas = []
+        for address, length in ranges:
+            try:
+                datas.append(self.read_bytes(int(address), int(length)))
+            except (ProcessException, OSError):
+                datas.append(b"")
+        return datas
+
+    def read_many(self, requests, gap=PAGE_SIZE, max_read=1 << 20, max_len=50, encoding='utf-8'):
+        """
+        read many values at once from a list of (address, data_type) where data_type is a type name
+        ('int', 'float' ...), 'string', 'bytes' (max_len bytes) or a number of bytes, return the values
+        in the same order, None for the ones which can't be read
+
+        requests are sorted and the values separated by less than gap bytes are read together, so
+        thousands of scattered values only cost a few range reads
+        """
+        decoders = [value_decoder(data_type, max_len) for _, data_type in requests]
+        plan = ReadPlan([int(address) for address, _ in requests], [size for size, _ in decoders], gap, max_read)
+        raw, lengths = plan.read(self)
+
+        data = raw.tobytes()
+        return [
+            decode_value(decoder, size, data[start: start + length], encoding)
+            for (size, decoder), start, length in zip(decoders, plan.starts.tolist(), lengths.tolist())
+        ]
+
+    def read_into(self, address, buffer):
+        """
+        read len(buffer) bytes at address straight into a writable buffer (bytearray, memoryview, numpy array)
+        and return the number of bytes read, backends override it to avoid any intermediate copy
+        """
+        view = memoryview(buffer).cast("B")
+        data = self.read_bytes(int(address), len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def get_modules(self):
+        """ return a dict of the modules loaded in the process by name """
+        return {}
+
     def get_symbolic_name(self, address):
-        return "0x%08X" % int(address)
+        module = self.module_map.find(address)
+        if module is not None:
+            return '%s+0x%08X' % (module.name, int(address) - module.base_addr)
+
+        return '0x%08X' % int(address)
+
+    def symbolize(self, addresses):
+        """ resolve the symbolic names of many addresses with a single module lookup """
+        return self.module_map.symbolize(addresses)
 
     def read(self,
              address: Union[Address, int],
@@ -51,27 +164,28 @@ class BaseProcess:
              ):
 
         if data_type == 's' or data_type == 'string':
-            data = self.read_bytes(int(address), length=max_len)
-
-            new_data = []
-
-            for char in data:
-                if char == ord('\x00'):
-                    return bytes(new_data).decode(encoding, decode_errors)
+            buffer = bytearray(max_len)
+            data = memoryview(buffer)[:self.read_into(int(address), buffer)]
 
-                new_data.append(char)
+            end = buffer.find(b'\x00', 0, len(data))
+            if end != -1:
+                return bytes(data[:end]).decode(encoding, decode_errors)
 
             if errors == 'ignore':
-                return new_data
+                return list(data)
 
             raise ProcessException('string > max_len')
 
         else:
             if data_type == 'bytes' or data_type == 'b':
-                return self.read_bytes(int(address), length=max_len)
+                buffer = bytearray(max_len)
+                return bytes(memoryview(buffer)[:self.read_into(int(address), buffer)])
 
             struct_type, struct_len = type_unpack(data_type)
-            return struct.unpack(struct_type, self.read_bytes(int(address), length=struct_len))[0]
+            buffer = bytearray(struct_len)
+            if self.read_into(int(address), buffer) != struct_len:
+                raise ProcessException('Can\'t read %s at 0x%08X' % (data_type, int(address)))
+            return struct.unpack_from(struct_type, buffer)[0]
 
     def write(self, address, data, data_type="uint"):
         if data_type != "bytes":
@@ -0,0 +1,405 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import errno
+import struct
+
+from ctypes import (
+    addressof,
+    byref,
+    get_errno,
+    create_string_buffer,
+)
+
+from .LinuxStructures import *
+from .BaseProcess import BaseProcess, ProcessException
+from .RegionMap import Region
+from .MemoryConstants import PAGE_NOACCESS, MEM_COMMIT, MEM_PRIVATE, MEM_MAPPED, MEM_IMAGE
+from . import utils
+
+
+class LinuxProcess(BaseProcess):
+    def __init__(self, pid=None, name=None, debug=True):
+        """ Create and Open a process object from its pid or from its name """
+        super(LinuxProcess, self).__init__()
+        if pid:
+            self._open(int(pid))
+
+        elif name:
+            self._open_from_name(name)
+        else:
+            raise ValueError(
+                "You need to instanciate process with at least a name or a pid"
+            )
+
+        self.min_addr = self._mmap_min_addr()
+        if self.is_64bit():
+            self.max_addr = 0x7FFFFFFFFFFF
+        else:
+            self.max_addr = 0xFFFFFFFF
+
+    def __del__(self):
+        self.close()
+
+    def is_64bit(self):
+        try:
+            with open("/proc/%d/exe" % self.pid, "rb") as f:
+                header = f.read(5)
+        except OSError:
+            return struct.calcsize("P") == 8
+        # EI_CLASS: 1 = ELFCLASS32, 2 = ELFCLASS64
+        return header[4:5] == b"\x02"
+
+    @staticmethod
+    def _mmap_min_addr():
+        try:
+            with open("/proc/sys/vm/mmap_min_addr") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0x10000
+
+    @staticmethod
+    def list():
+        processes = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+
+            proc = {'pid': int(entry)}
+            # comm is cut to 15 characters, the executable and argv[0] give the full name
+            names = []
+            try:
+                with open("/proc/%s/comm" % entry) as f:
+                    names.append(f.read().strip())
+            except OSError:
+                pass
+            try:
+                names.append(os.path.basename(os.readlink("/proc/%s/exe" % entry)))
+            except OSError:
+                pass
+            try:
+                with open("/proc/%s/cmdline" % entry, "rb") as f:
+                    argv0 = f.read().split(b"\0", 1)[0]
+                if argv0:
+                    names.append(os.path.basename(argv0.decode(errors="replace")))
+            except OSError:
+                pass
+
+            if names:
+                proc['name'] = names[0]
+                # prefer the full name when comm has been truncated
+                for name in names[1:]:
+                    if len(names[0]) == 15 and name.startswith(names[0]):
+                        proc['name'] = name
+                        break
+                proc['names'] = list(dict.fromkeys(names))
+
+            processes.append(proc)
+
+        return processes
+
+    @staticmethod
+    def processes_from_name(process_name):
+        processes = []
+        for process in LinuxProcess.list():
+            if process_name in process.get('names', ()):
+                processes.append(process)
+
+        if len(processes) > 0:
+            return processes
+
+    @staticmethod
+    def name_from_process(dwProcessId):
+        for process in LinuxProcess.list():
+            if process['pid'] == dwProcessId:
+                return process.get("name", None)
+
+        return False
+
+    def _open(self, pid):
+        if not os.path.isdir("/proc/%d" % pid):
+            raise ProcessException("no process with pid %d" % pid)
+        self.pid = pid
+        self.h_process = pid
+        self.isProcessOpen = True
+        return True
+
+    def close(self):
+        if self.isProcessOpen:
+            self.h_process = None
+            self.pid = None
+            self.isProcessOpen = False
+            return True
+        return False
+
+    def _open_from_name(self, processName):
+        processes = self.processes_from_name(processName)
+        if not processes:
+            raise ProcessException("can't get pid from name %s" % processName)
+        elif len(processes) > 1:
+            raise ValueError(
+                "There is multiple processes with name %s. Please select a process from its pid instead"
+                % processName
+            )
+        self._open(processes[0]["pid"])
+
+    def iter_maps(self):
+        """ yield (start, end, perms, offset, path) for every line of /proc/<pid>/maps """
+        with open("/proc/%d/maps" % self.pid) as f:
+            for line in f:
+                fields = line.split(None, 5)
+                start, end = fields[0].split("-")
+                path = fields[5].strip() if len(fields) > 5 else ""
+                yield int(start, 16), int(end, 16), fields[1], int(fields[2], 16), path
+
+    def stack_pointers(self):
+        """ return the stack pointer of every thread stopped in or blocked out of a system call """
+        pointers = []
+        try:
+            tids = os.listdir("/proc/%d/task" % self.pid)
+        except OSError:
+            return pointers
+        for tid in tids:
+            try:
+                with open("/proc/%d/task/%s/syscall" % (self.pid, tid)) as f:
+                    fields = f.read().split()
+            except OSError:
+                continue
+            # "nr args... sp pc", "-1 sp pc" or "running"
+            if len(fields) >= 3:
+                pointers.append(int(fields[-2], 16))
+        return pointers
+
+    def query_regions(self):
+        maps = list(self.iter_maps())
+        # a file with an executable mapping is an image (executable or shared library), other files are data
+        images = set(path for _, _, perms, _, path in maps if path.startswith("/") and "x" in perms)
+        stack_pointers = self.stack_pointers()
+
+        regions = []
+        for start, end, perms, _, path in maps:
+            # vvar pages are mapped readable but can't be accessed through process_vm_readv
+            if path.startswith("[vvar") or start >= self.max_addr:
+                continue
+            module = None
+            if path.startswith("/"):
+                region_type = MEM_IMAGE if path in images else MEM_MAPPED
+                module = os.path.basename(path)
+            elif path in ("[vdso]", "[vsyscall]"):
+                # code mapped by the kernel
+                region_type = MEM_IMAGE
+                module = path
+            elif perms[3:4] == "s":
+                # anonymous shared memory
+                region_type = MEM_MAPPED
+            else:
+                region_type = MEM_PRIVATE
+            stack = path.startswith("[stack") or (
+                region_type == MEM_PRIVATE and any(start <= sp < end for sp in stack_pointers)
+            )
+            regions.append(
+                Region(
+                    base=start,
+                    size=end - start,
+                    protect=PERMS_TO_PROTECT.get(perms[:3], PAGE_NOACCESS),
+                    state=MEM_COMMIT,
+                    type=region_type,
+                    module=module,
+                    stack=stack,
+                )
+            )
+
+        return regions
+
+    def _readv(self, ranges, base):
+        """
+        read all (address, length) ranges one after the other into the local memory at base with as few
+        process_vm_readv calls as possible, return the number of bytes actually read for each range
+        """
+        sizes = [0] * len(ranges)
+        index = 0
+        local_offset = 0
+
+        while index < len(ranges):
+            batch = ranges[index: index + IOV_MAX]
+            total = sum(length for _, length in batch)
+            local = IOVEC(base + local_offset, total)
+            remote = (IOVEC * len(batch))(*[IOVEC(address, length) for address, length in batch])
+
+            res = process_vm_readv(self.pid, byref(local), 1, remote, len(batch), 0)
+            if res < 0:
+                err = get_errno()
+                if err != errno.EFAULT:
+                    raise OSError(err, os.strerror(err))
+                res = 0
+
+            # the transfer stops at the first remote range that can't be fully read, record
+            # what has been read so far and restart right after the faulty range
+            for address, length in batch:
+                read = min(res, length)
+                sizes[index] = read
+                res -= read
+                local_offset += length
+                index += 1
+                if read < length:
+                    break
+
+        return sizes
+
+    def read_ranges(self, ranges):
+        """
+        read many (address, length) ranges in a few syscalls, return a list of bytes in the same order,
+        an unreadable range is returned truncated to what could be read (possibly empty)
+        """
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't read_ranges, process %s is not open" % self.pid
+            )
+
+        ranges = [(int(address), int(length)) for address, length in ranges]
+        buffer = create_string_buffer(sum(length for _, length in ranges) or 1)
+        sizes = self._readv(ranges, addressof(buffer))
+
+        result = []
+        offset = 0
+        raw = buffer.raw
+        for (_, length), size in zip(ranges, sizes):
+            result.append(raw[offset: offset + size])
+            offset += length
+
+        return result
+
+    def read_bytes(self, address, length: int = 4):
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't read_bytes, process %s is not open" % self.pid
+            )
+
+        address = int(address)
+        buffer = create_string_buffer(length)
+        size = self._readv([(address, length)], addressof(buffer))[0]
+
+        if not size:
+            raise ProcessException(
+                "Error in process_vm_readv(%08x, %d)" % (address, length)
+            )
+        return buffer.raw[:size]
+
+    def read_into(self, address, buffer):
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't read_into, process %s is not open" % self.pid
+            )
+
+        address = int(address)
+        target = utils.ctypes_buffer(buffer)
+        if not len(target):
+            return 0
+        size = self._readv([(address, len(target))], addressof(target))[0]
+
+        if not size:
+            raise ProcessException(
+                "Error in process_vm_readv(%08x, %d)" % (address, len(target))
+            )
+        return size
+
+    def _write_proc_mem(self, address, data):
+        """ /proc/<pid>/mem ignores page protections, like VirtualProtectEx + WriteProcessMemory """
+        try:
+            fd = os.open("/proc/%d/mem" % self.pid, os.O_RDWR)
+        except OSError:
+            return False
+        try:
+            return os.pwrite(fd, data, address) == len(data)
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
+    def write_ranges(self, ranges):
+        """
+        write many (address, data) ranges in a few syscalls, return a list of booleans telling
+        which writes succeeded
+        """
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't write_ranges, process %s is not open" % self.pid
+            )
+
+        ranges = [(int(address), bytes(data)) for address, data in ranges]
+        status = [False] * len(ranges)
+        buffer = create_string_buffer(b"".join(data for _, data in ranges))
+        base = addressof(buffer)
+        index = 0
+        local_offset = 0
+
+        while index < len(ranges):
+            batch = ranges[index: index + IOV_MAX]
+            total = sum(len(data) for _, data in batch)
+            local = IOVEC(base + local_offset, total)
+            remote = (IOVEC * len(batch))(*[IOVEC(address, len(data)) for address, data in batch])
+
+            res = process_vm_writev(self.pid, byref(local), 1, remote, len(batch), 0)
+            if res < 0:
+                err = get_errno()
+                if err != errno.EFAULT:
+                    raise OSError(err, os.strerror(err))
+                res = 0
+
+            for address, data in batch:
+                written = min(res, len(data))
+                res -= written
+                local_offset += len(data)
+                if written < len(data):
+                    # most likely a read-only page, retry through /proc/<pid>/mem
+                    status[index] = self._write_proc_mem(address, data)
+                    index += 1
+                    break
+                status[index] = True
+                index += 1
+
+        return status
+
+    def write_bytes(self, address, data):
+        address = int(address)
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't write_bytes(%s, %s), process %s is not open"
+                % (address, data, self.pid)
+            )
+        return self.write_ranges([(address, data)])[0]
+
+    def get_modules(self) -> dict[ModuleEntry]:
+        modules: dict[ModuleEntry] = {}
+
+        for start, end, _, _, path in self.iter_maps():
+            if not path.startswith("/"):
+                continue
+            name = os.path.basename(path)
+            module = modules.get(name)
+            if module is None:
+                modules[name] = ModuleEntry(name=name, path=path, base_addr=start, base_size=end - start)
+            elif module.path == path:
+                module.base_size = max(module.base_size, end - module.base_addr)
+
+        return modules
+
+    def has_module(self, module):
+        for m in self.module_map.get_modules():
+            if module == m.name or m.name.startswith(module + "."):
+                return True
+        return False
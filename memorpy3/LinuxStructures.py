@@ -0,0 +1,83 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+from ctypes import (
+    CDLL,
+    Structure,
+    POINTER,
+    c_int,
+    c_ulong,
+    c_void_p,
+    c_size_t,
+    c_ssize_t,
+)
+from ctypes.util import find_library
+from dataclasses import dataclass
+
+from .MemoryConstants import *
+
+
+class IOVEC(Structure):
+    """struct iovec from <sys/uio.h>"""
+
+    _fields_ = [
+        ("iov_base", c_void_p),
+        ("iov_len", c_size_t),
+    ]
+
+
+@dataclass
+class ModuleEntry:
+    """a file mapped in the process address space, as listed by /proc/<pid>/maps"""
+
+    # The module name (basename of the mapped file).
+    name: str
+
+    # The module path.
+    path: str
+
+    # The lowest address the file is mapped at.
+    base_addr: int
+
+    # The size of the whole image, from base_addr to the end of its last mapping.
+    base_size: int
+
+
+libc = CDLL(find_library("c") or "libc.so.6", use_errno=True)
+
+process_vm_readv = libc.process_vm_readv
+process_vm_readv.argtypes = [c_int, POINTER(IOVEC), c_ulong, POINTER(IOVEC), c_ulong, c_ulong]
+process_vm_readv.restype = c_ssize_t
+
+process_vm_writev = libc.process_vm_writev
+process_vm_writev.argtypes = [c_int, POINTER(IOVEC), c_ulong, POINTER(IOVEC), c_ulong, c_ulong]
+process_vm_writev.restype = c_ssize_t
+
+# maximum number of iovec entries accepted by a single process_vm_readv call
+IOV_MAX = 1024
+
+# protections are exposed with the same bitmask values as on windows so the
+# protec argument of iter_region / mem_search is portable across backends
+PERMS_TO_PROTECT = {
+    "---": PAGE_NOACCESS,
+    "r--": PAGE_READONLY,
+    "rw-": PAGE_READWRITE,
+    "-w-": PAGE_READWRITE,
+    "--x": PAGE_EXECUTE,
+    "r-x": PAGE_EXECUTE_READ,
+    "rwx": PAGE_EXECUTE_READWRITE,
+    "-wx": PAGE_EXECUTE_READWRITE,
+}
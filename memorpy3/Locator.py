@@ -17,31 +17,101 @@
 import copy
 import struct
 
+import numpy as np
+
 from memorpy3.Address import Address
+from memorpy3.Snapshot import Snapshot
+from memorpy3.ReadPlan import ReadPlan
+from memorpy3 import utils
+
+
+class CandidateSet:
+    """
+    sorted array of candidate addresses of one data type, Address objects are only
+    built when the set is iterated or indexed
+
+    values holds the last value read at every address when it is known
+    """
+
+    def __init__(self, process, data_type, addresses=None, values=None):
+        self.process = process
+        self.data_type = data_type
+        if addresses is None:
+            addresses = []
+        self.addresses = np.asarray(addresses, dtype=np.uint64)
+        self.values = values
+
+    def filter(self, mask, values=None):
+        """ return a new set holding the candidates where mask is True, with their new values if given """
+        if values is None and self.values is not None:
+            values = self.values[mask]
+        return CandidateSet(self.process, self.data_type, self.addresses[mask], values)
+
+    def difference(self, other):
+        """ return a new set holding the candidates which are not in other """
+        return self.filter(np.isin(self.addresses, other.addresses, assume_unique=True, invert=True))
+
+    def symbolize(self):
+        """ return the symbolic names of all the candidates """
+        return self.process.symbolize(self.addresses)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __iter__(self):
+        for address in self.addresses.tolist():
+            yield Address(address, self.process, self.data_type)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.filter(index)
+        return Address(int(self.addresses[index]), self.process, self.data_type)
+
+    def __contains__(self, address):
+        index = np.searchsorted(self.addresses, int(address))
+        return index < len(self.addresses) and int(self.addresses[index]) == int(address)
+
+    def __repr__(self):
+        if len(self) > 100:
+            return "<CandidateSet %s: %d addresses>" % (self.data_type, len(self))
+        return repr(list(self))
 
 
 class Locator:
     """
     take a MemoryWorker and a type to search then you can feed the locator
     with values and it will reduce the addresses possibilities
+
+    float and double values are matched within +/- epsilon, a utils.FloatRange(lo, hi) can be fed instead of
+    a value, a tuple of values is a pattern which is only searched as integer types
+
+    when the initial value is unknown, take a snapshot() and then narrow the addresses
+    with compare("changed"), compare("increased_by", 5), compare("in_range", (0, 100)), ...
+
+    scope (like "heap") and module (like "game.exe") restrict the regions searched, see RegionMap.filter
     """
 
-    def __init__(self, mw, data_type="unknown", start=None, end=None):
+    def __init__(
+        self, mw, data_type="unknown", start=None, end=None, epsilon=None, alignment=None, scope=None, module=None
+    ):
         self.mw = mw
+        self.epsilon = epsilon
+        self.alignment = alignment
         self.type = data_type
         self.last_iteration = {}
         self.last_value = None
+        self.last_snapshot = None
         self.start = start
         self.end = end
+        self.scope = scope
+        self.module = module
 
     def find(self, value, erase_last=True):
         return self.feed(value, erase_last)
 
-    def feed(self, value, erase_last=True):
-        self.last_value = value
-        new_iter = copy.copy(self.last_iteration)
+    def types(self):
         if self.type == "unknown":
-            all_types = [
+            return [
                 "uint",
                 "int",
                 "long",
@@ -51,37 +121,166 @@ class Locator:
                 "short",
                 "ushort",
             ]
-        else:
-            all_types = [self.type]
-
-        for data_type in all_types:
-            if data_type not in new_iter:
-                try:
-                    new_iter[data_type] = [
-                        Address(x, self.mw.process, data_type)
-                        for x in self.mw.mem_search(
-                            value, data_type, start_offset=self.start, end_offset=self.end
-                        )
-                    ]
-                except struct.error:
-                    new_iter[data_type] = []
-            else:
-                l = []
-                for address in new_iter[data_type]:
-                    try:
-                        found = self.mw.process.read(address, data_type)
-                        if int(found) == int(value):
-                            l.append(Address(address, self.mw.process, data_type))
-                    except Exception as e:
-                        pass
+        return [self.type]
+
+    def feed(self, value, erase_last=True):
+        self.last_value = value
+        new_iter = copy.copy(self.last_iteration)
 
-                new_iter[data_type] = l
+        # every missing type is searched in a single pass over the memory
+        missing = [data_type for data_type in self.types() if data_type not in new_iter]
+        hits = {data_type: [] for data_type in missing}
+        if missing:
+            for data_type, addresses in self.mw.mem_scan_types(
+                value, missing, start_offset=self.start, end_offset=self.end,
+                alignment=self.alignment, epsilon=self.epsilon, scope=self.scope, module=self.module,
+            ):
+                hits[data_type].append(addresses)
+
+        for data_type in self.types():
+            if data_type in hits:
+                candidates = CandidateSet(
+                    self.mw.process, data_type, np.concatenate(hits[data_type]) if hits[data_type] else None
+                )
+                if len(candidates) and data_type in ("float", "double"):
+                    # floats match within a tolerance or a FloatRange, keep what was actually read
+                    rows, valid = self.read_rows(candidates.addresses, utils.type_dtype(data_type).itemsize)
+                    candidates = candidates.filter(valid, rows[valid].view(utils.type_dtype(data_type))[:, 0])
+                elif len(candidates) and not isinstance(value, (tuple, list)):
+                    candidates.values = np.full(len(candidates), value, dtype=utils.type_dtype(data_type))
+                new_iter[data_type] = candidates
+            else:
+                new_iter[data_type] = self.narrow(new_iter[data_type], value)
 
         if erase_last:
             del self.last_iteration
             self.last_iteration = new_iter
         return new_iter
 
+    def matcher(self, value, data_type):
+        """
+        return (size, function) where function takes a (n, size) array of raw values
+        and returns the mask of the rows matching value
+        """
+        if data_type in ("float", "double"):
+            lo, hi = utils.float_bounds(value, data_type, self.epsilon)
+            dtype = lo.dtype
+
+            def match(rows):
+                values = rows.view(dtype)[:, 0]
+                return (values >= lo) & (values <= hi)
+
+            return dtype.itemsize, match
+
+        struct_type, struct_len = utils.type_unpack(data_type)
+        if isinstance(value, (tuple, list)):
+            packed = b''.join([struct.pack(struct_type, v) for v in value])
+        else:
+            packed = struct.pack(struct_type, value)
+        target = np.frombuffer(packed, dtype=np.uint8)
+
+        def match(rows):
+            return np.all(rows == target, axis=1)
+
+        return len(packed), match
+
+    def read_rows(self, addresses, size):
+        """
+        read size bytes at every address, return a (n, size) array and the mask of readable rows
+
+        addresses close to each other are read together, a few hundred reads cover millions of candidates
+        """
+        raw, lengths = ReadPlan(addresses, size).read(self.mw.process)
+        return raw.reshape(len(addresses), size), lengths == size
+
+    def narrow(self, candidates, value):
+        """ re-read all the candidates and keep those still matching value """
+        try:
+            size, match = self.matcher(value, candidates.data_type)
+        except (struct.error, ValueError):
+            return candidates.filter(np.zeros(len(candidates), dtype=bool))
+
+        rows, valid = self.read_rows(candidates.addresses, size)
+        mask = valid & match(rows)
+        if isinstance(value, (tuple, list)):
+            # a sequence of values does not fit in a single value per candidate
+            return candidates.filter(mask)
+        return candidates.filter(mask, rows[mask].view(utils.type_dtype(candidates.data_type))[:, 0])
+
+    def snapshot(self, level=1):
+        """ remember the whole memory to later narrow addresses with compare() without knowing their value """
+        self.last_iteration = {}
+        self.last_snapshot = Snapshot.take(
+            self.mw, level=level, start_offset=self.start, end_offset=self.end, scope=self.scope, module=self.module
+        )
+        return self.last_snapshot
+
+    def compare(self, predicate, value=None, erase_last=True):
+        """
+        keep the addresses whose current value satisfies predicate against the previous one:
+        changed, unchanged, increased, decreased, increased_by / decreased_by value or in_range [lo, hi]
+        """
+        new_iter = copy.copy(self.last_iteration)
+        from_snapshot = [data_type for data_type in self.types() if data_type not in new_iter]
+
+        if from_snapshot:
+            if self.last_snapshot is None:
+                raise ValueError("no previous values to compare with, call snapshot() or feed() first")
+            new_iter.update(self.compare_snapshot(from_snapshot, predicate, value))
+
+        for data_type in self.types():
+            if data_type in from_snapshot:
+                continue
+            candidates = new_iter[data_type]
+            if candidates.values is None:
+                raise ValueError("previous values of %s candidates are unknown" % data_type)
+            dtype = utils.type_dtype(data_type)
+            rows, valid = self.read_rows(candidates.addresses, dtype.itemsize)
+            current = rows.view(dtype)[:, 0]
+            mask = valid & utils.compare_values(predicate, candidates.values, current, value, self.epsilon)
+            new_iter[data_type] = candidates.filter(mask, current[mask])
+
+        if erase_last:
+            self.last_iteration = new_iter
+            self.last_snapshot = None
+        return new_iter
+
+    def compare_snapshot(self, types, predicate, value=None):
+        """ compare the current memory with the last snapshot, return the new candidates of every type """
+        hits = {data_type: ([], []) for data_type in types}
+
+        overlap = max(utils.type_dtype(data_type).itemsize for data_type in types) - 1
+        for offset, b, end in self.mw.iter_windows(
+            start_offset=self.start, end_offset=self.end, overlap=overlap, scope=self.scope, module=self.module
+        ):
+            old, known = self.last_snapshot.read(offset, len(b))
+            for data_type in types:
+                dtype = utils.type_dtype(data_type)
+                alignment = self.alignment or dtype.itemsize
+                addresses, values = hits[data_type]
+                for start, stride, current in utils.iter_aligned_views(b, dtype, offset, alignment):
+                    if not len(current):
+                        continue
+                    previous = utils.strided_view(old, dtype, start, stride)
+                    # values partly outside of the snapshot can't be compared
+                    mask = known[start::stride][:len(current)] & known[start + dtype.itemsize - 1::stride][:len(current)]
+                    mask &= utils.compare_values(predicate, previous, current, value, self.epsilon)
+                    index = np.flatnonzero(mask)
+                    # values starting in the overlap belong to the next chunk
+                    index = index[index * stride + start < end]
+                    addresses.append(index.astype(np.uint64) * stride + (offset + start))
+                    values.append(current[index])
+
+        result = {}
+        for data_type, (addresses, values) in hits.items():
+            dtype = utils.type_dtype(data_type)
+            addresses = np.concatenate(addresses) if addresses else np.empty(0, dtype=np.uint64)
+            values = np.concatenate(values) if values else np.empty(0, dtype=dtype)
+            order = np.argsort(addresses, kind="stable")
+            result[data_type] = CandidateSet(self.mw.process, data_type, addresses[order], values[order])
+
+        return result
+
     def get_addresses(self):
         return self.last_iteration
 
@@ -93,12 +292,9 @@ class Locator:
         new = self.feed(self.last_value, erase_last=erase_last)
         ret = {}
 
-        for data_type, l in iter(last.items()):
-            typeset = set([int(a) for a in new[data_type]])
-            for address in l:
-                if int(address) not in typeset:
-                    if data_type not in ret:
-                        ret[data_type] = []
-                    ret[data_type].append(address)
+        for data_type, candidates in iter(last.items()):
+            modified = candidates.difference(new[data_type])
+            if len(modified):
+                ret[data_type] = modified
 
         return ret
@@ -20,24 +20,53 @@ import re
 import logging
 import struct
 import traceback
-import binascii
+import functools
+
+import numpy as np
 
-from .WinProcess import WinProcess as Process
 from . import utils
 from .Address import Address
 from .BaseProcess import ProcessException
-from .WinStructures import *
+from .PatternSet import PatternSet
+from .ParallelScan import parallel_search, parallel_scan
+from .PointerScan import PointerIndex
+from .RegexSet import RegexSet
+from .PointerChain import PointerChain, PointerResolver
+from .RegionMap import Region
+from .MemoryConstants import PAGE_READABLE, PAGE_READONLY, PAGE_READWRITE
+from .Signature import Signature
+from .StringExtractor import StringExtractor, extractor_matcher
+from .StringPattern import StringPattern, STRING_ENCODINGS
+from .Watcher import Watcher, WATCH_INTERVAL
+from .SnapshotProcess import write_snapshot
+
+if sys.platform == "win32":
+    from .WinProcess import WinProcess as Process
+else:
+    from .LinuxProcess import LinuxProcess as Process
 
 logger = logging.getLogger("memorpy3")
 
 REGEX_TYPE = type(re.compile("^plop$"))
+FLOAT_TYPES = ("float", "double")
+
+# regions are streamed through chunks of this size to keep memory usage bounded
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# number of bytes a regex match can spread over the next chunk
+REGEX_OVERLAP = 4096
 
 
 class MemWorker:
     def __init__(
-        self, pid=None, name=None, end_offset=None, start_offset=None, debug=True
+        self, pid=None, name=None, end_offset=None, start_offset=None, debug=True, process=None
     ):
-        self.process = Process(name=name, pid=pid, debug=debug)
+        """ open a process from its pid or name, or work on an already opened process (like a SnapshotProcess) """
+        if process is not None:
+            self.process = process
+        else:
+            self.process = Process(name=name, pid=pid, debug=debug)
+        self.resolver = PointerResolver(self.process)
 
     def __enter__(self):
         return self
@@ -45,138 +74,529 @@ class MemWorker:
     def __exit__(self, type, value, traceback):
         self.process.close()
 
+    def save_snapshot(self, path, **kwargs):
+        """ write every readable region to a snapshot file which can be opened later with SnapshotProcess """
+        return write_snapshot(self.process, path, **kwargs)
+
     def address(self, value, default_type="uint"):
         """ wrapper to instantiate an Address class for the memworker.process"""
         return Address(value, process=self.process, default_type=default_type)
 
+    def pointer_chain(self, chain, default_type="uint"):
+        """ wrapper to instantiate a PointerChain resolved by the shared resolver of the memworker """
+        return PointerChain(chain, process=self.process, default_type=default_type, resolver=self.resolver)
+
+    def resolve_chains(self, chains, new_generation=True):
+        """ resolve many PointerChain at once, starting a new generation first unless new_generation is False """
+        if new_generation:
+            self.resolver.new_generation()
+        return self.resolver.resolve(list(chains))
+
+    def watch(self, addresses, data_type=None, interval=WATCH_INTERVAL, callback=None, queue=None, start=True):
+        """
+                poll addresses from a background thread and report their changes as WatchEvent(address, old,
+                new, timestamp) to callback and / or queue, return the (started) Watcher
+        """
+        watcher = Watcher(self.process, interval=interval, callback=callback, queue=queue)
+        for address in addresses:
+            watcher.add(address, data_type)
+        if start:
+            watcher.start()
+        return watcher
+
     def umem_replace(self, regex, replace):
         """ like search_replace_mem but works with unicode strings """
         regex = utils.re_to_unicode(regex)
         replace = replace.encode("utf-16-le")
-        return self.mem_replace(re.compile(regex, re.UNICODE), replace)
+        return self.mem_replace(re.compile(regex), replace)
 
     def mem_replace(self, regex, replace):
-        """ search memory for a pattern and replace all found occurrences """
-        all_writes_succeed = True
-        for _, start_offset in self.mem_search(regex, ftype="re"):
-            if self.process.write_bytes(start_offset, replace) == 1:
-                logger.debug("Write at offset %s succeeded !" % start_offset)
-            else:
-                all_writes_succeed = False
-                logger.debug("Write at offset %s failed !" % start_offset)
+        """
+                search memory for a pattern and replace all found occurrences with a single batch of writes,
+                return a list of (address, success) for every occurrence
+        """
+        addresses = [address for _, address in self.mem_search(regex, ftype="re")]
+        status = self.process.write_many([(address, replace) for address in addresses])
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for address, success in zip(addresses, status):
+                logger.debug("Write at offset 0x%X %s !", int(address), "succeeded" if success else "failed")
 
-        return all_writes_succeed
+        return list(zip(addresses, status))
 
-    def umem_search(self, regex):
+    def umem_search(self, regex, **kwargs):
         """ like mem_search but works with unicode strings """
-        regex = utils.re_to_unicode(regex)
-        for _, i in self.mem_search(str(regex), ftype="re"):
+        for _, i in self.str_search(regex, encodings="utf-16-le", ignore_case=True, **kwargs):
             yield i
 
+    def str_search(self, text, encodings=STRING_ENCODINGS, ignore_case=False, **kwargs):
+        """
+                iterator returning (encoding, address) for every occurrence of text encoded in one of encodings,
+                all of them are searched in a single pass, see StringPattern
+        """
+        return self.mem_search(StringPattern(text, encodings, ignore_case), ftype="str", **kwargs)
+
     def group_search(self, group, start_offset=None, end_offset=None):
-        regex = ""
+        regex = b""
         for value, _type in group:
             if _type == "f" or _type == "float":
                 f = struct.pack("<f", float(value))
-                regex += b".." + f[2:4]
+                regex += b".." + re.escape(f[2:4])
             else:
                 raise NotImplementedError("unknown type %s" % _type)
 
         return self.mem_search(
-            regex, ftype="re", start_offset=start_offset, end_offset=end_offset
+            re.compile(regex, re.DOTALL), ftype="re", start_offset=start_offset, end_offset=end_offset
         )
 
-    def search_address(self, addr):
-        a = "%08X" % addr
-        logger.debug("searching address %s" % a)
-        regex = ""
-        for i in range(len(a) - 2, -1, -2):
-            regex += binascii.unhexlify(a[i : i + 2])
-
-        for _, a in self.mem_search(re.escape(regex), ftype="re"):
+    def search_address(self, addr, alignment=None, **kwargs):
+        """ iterator returning the addresses holding a pointer to addr, stored on the pointer size of the process """
+        logger.debug("searching address %08X" % int(addr))
+        pointer = struct.pack("<Q" if self.process.is_64bit() else "<I", int(addr))
+        for a in self.mem_search(pointer, alignment=alignment, **kwargs):
             yield a
 
-    def parse_re_function(self, b, value, offset):
-        for name, regex in value:
-            for res in regex.finditer(str(b)):
-                yield name, self.address(offset + res.start(), "bytes")
-                """
-                index = b.find(res)
-                while index != -1:
-                    soffset = offset + index
-                    if soffset not in duplicates_cache:
-                        duplicates_cache.add(soffset)
-                        yield name, self.Address(soffset, 'bytes')
-                    index = b.find(res, index + len(res))
-                """
-
-    def parse_float_function(self, b, value, offset):
-        for index in range(0, len(b)):
-            try:
-                struct_type, struct_len = utils.type_unpack("float")
-                tmpval = struct.unpack(struct_type, b[index: index + 4])[0]
-                if int(value) == int(tmpval):
-                    soffset = offset + index
-                    yield self.address(soffset, "float")
-            except Exception as e:
-                pass
+    def pointer_index(self, **kwargs):
+        """ index every pointer of the process, see PointerIndex.build """
+        return PointerIndex.build(self, **kwargs)
+
+    def pointer_scan(self, addr, depth=4, max_offset=0x1000, max_results=None, index=None, **kwargs):
+        """
+                iterator returning the static PointerPath leading to addr, like game.exe+0x1234 -> +0x10 -> +0x8,
+                through at most depth pointers. Build the index once with pointer_index and pass it to run
+                several scans against the same state of the process
+        """
+        if index is None:
+            index = self.pointer_index(**kwargs)
+        return index.scan(int(addr), depth=depth, max_offset=max_offset, max_results=max_results)
+
+    def parse_re_function(self, b, value, offset, end=None):
+        for index, res in value.finditer(b, end):
+            yield value.names[index], self.address(offset + res.start(), "bytes")
+
+    def parse_float_function(self, b, value, offset, alignment=None, data_type="float", end=None):
+        lo, hi = value
+        hits = utils.find_in_range(b, lo, hi, lo.dtype, offset, alignment)
+        for soffset in utils.clip_hits(hits, offset, end).tolist():
+            yield self.address(soffset, data_type)
 
     @staticmethod
-    def parse_named_groups_function(b, value, offset=None):
-        for name, regex in value:
-            for res in regex.finditer(b):
-                yield name, res.groupdict()
+    def parse_named_groups_function(b, value, offset=None, end=None):
+        for index, res in value.finditer(b, end):
+            yield value.names[index], value.groupdict(index, res)
 
     @staticmethod
-    def parse_groups_function(b, value, offset=None):
-        for name, regex in value:
-            for res in regex.finditer(b):
-                yield name, res.groups()
-
-    def parse_any_function(self, b, value, offset):
-        index = b.find(value)
-        while index != -1:
-            soffset = offset + index
+    def parse_groups_function(b, value, offset=None, end=None):
+        for index, res in value.finditer(b, end):
+            yield value.names[index], value.groups(index, res)
+
+    def parse_any_function(self, b, value, offset, alignment=None, end=None):
+        hits = utils.find_bytes(b, value, offset, alignment)
+        for soffset in utils.clip_hits(hits, offset, end).tolist():
             yield self.address(soffset, "bytes")
-            index = b.find(value, index + 1)
 
-    def mem_search(
+    def parse_multi_function(self, b, value, offset, alignment=None, end=None):
+        indexes, hits = value.find(b, offset, alignment, end)
+        for index, soffset in zip(indexes.tolist(), hits.tolist()):
+            yield value.ids[index], self.address(soffset, "bytes")
+
+    def parse_str_function(self, b, value, offset, alignment=None, end=None):
+        for position, encoding in value.find(b, end):
+            if alignment and (offset + position) % alignment:
+                continue
+            yield encoding, self.address(offset + position, "bytes")
+
+    def parse_typed_function(self, b, value, offset, alignment=None, data_type="bytes", end=None):
+        hits = self.find_typed_offsets(b, value, offset, alignment)
+        for soffset in utils.clip_hits(hits, offset, end).tolist():
+            yield self.address(soffset, data_type)
+
+    @staticmethod
+    def find_typed_offsets(b, value, offset, alignment=None):
+        """ vectorized search of a single packed value, return a numpy array of absolute addresses """
+        dtype = utils.uint_dtype(len(value))
+        target = np.frombuffer(value, dtype=dtype)[0]
+        return utils.find_values(b, target, dtype, offset, alignment)
+
+    def iter_windows(
+        self,
+        protec=PAGE_READWRITE | PAGE_READONLY,
+        optimizations=None,
+        start_offset=None,
+        end_offset=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        overlap=0,
+        cancel=None,
+        regions=None,
+        scope=None,
+        module=None,
+    ):
+        """
+                iterator returning (offset, bytes, end) for every readable region, streamed in chunks of at most
+                max_chunk_size bytes. Every chunk is followed by up to overlap bytes of the next one, so a match
+                crossing a chunk boundary is found in full, and only matches starting before end belong to the
+                chunk, so it is not reported twice. Regions are scanned independently, matches never span two of them.
+
+                chunks are memoryviews of a single buffer reused for the whole scan, copy them to keep them around
+
+                cancel is an optional threading.Event, the scan stops before reading the next chunk once it is set
+
+                regions is an optional list of Region or (offset, size) scanned instead of the regions of the process,
+                scope ("heap", "stack", "image", "mapped", "private" or a list of them) and module (like "game.exe")
+                restrict the regions scanned, see RegionMap.filter
+        """
+        if not self.process.isProcessOpen:
+            raise ProcessException(
+                "Can't read_bytes, process %s is not open" % self.process.pid
+            )
+
+        buffer = None
+        # snapshots hand out views of their memory mapping instead of copying into the buffer
+        read_view = getattr(self.process, "read_view", None)
+        if regions is None:
+            regions = self.process.iter_region(
+                start_offset=start_offset,
+                end_offset=end_offset,
+                protec=protec,
+                optimizations=optimizations,
+                scope=scope,
+                module=module,
+            )
+        for region in regions:
+            region_offset, region_size = (region.base, region.size) if isinstance(region, Region) else region
+            region_end = region_offset + region_size
+            current_offset = region_offset
+            while current_offset < region_end:
+                if cancel is not None and cancel.is_set():
+                    return
+                chunk_size = min(max_chunk_size, region_end - current_offset)
+                length = min(chunk_size + overlap, region_end - current_offset)
+                if read_view is None and (buffer is None or len(buffer) < length):
+                    buffer = memoryview(bytearray(min(max_chunk_size + overlap, max(length, 1 << 20))))
+                try:
+                    if read_view is not None:
+                        b = read_view(current_offset, length)
+                    else:
+                        b = buffer[:self.process.read_into(current_offset, buffer[:length])]
+                except IOError as e:
+                    print(traceback.format_exc())
+                    if e.errno == 13:
+                        raise
+                    else:
+                        logger.warning(e)
+                    break
+                except Exception as e:
+                    logger.warning(e)
+                    break
+
+                if not b:
+                    break
+
+                yield current_offset, b, min(chunk_size, len(b))
+
+                if len(b) < chunk_size:
+                    # partial read, the end of the region is not readable
+                    break
+                current_offset += chunk_size
+
+    def iter_chunks(
+        self,
+        protec=PAGE_READWRITE | PAGE_READONLY,
+        optimizations=None,
+        start_offset=None,
+        end_offset=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        cancel=None,
+        scope=None,
+        module=None,
+    ):
+        """ iterator returning (offset, bytes) for every readable region, in chunks of at most max_chunk_size bytes """
+        for offset, b, _ in self.iter_windows(
+            protec=protec,
+            optimizations=optimizations,
+            scope=scope,
+            module=module,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            max_chunk_size=max_chunk_size,
+            cancel=cancel,
+        ):
+            yield offset, b
+
+    def typed_matcher(self, value, ftype="uint", alignment=None, epsilon=None):
+        """
+                return (key, function) where function(b, offset) gives the numpy array of the addresses of b
+                holding value and key is shared by the types matching the same bytes (like int and uint of
+                a positive value), raise struct.error or ValueError when value can't be searched as ftype
+        """
+        if ftype in FLOAT_TYPES:
+            lo, hi = utils.float_bounds(value, ftype, epsilon)
+            return (ftype, lo, hi), lambda b, offset: utils.find_in_range(b, lo, hi, lo.dtype, offset, alignment)
+
+        struct_type, struct_len = utils.type_unpack(ftype)
+        if isinstance(value, (tuple, list)):
+            pattern = b''.join([struct.pack(struct_type, v) for v in value])
+            return ("pattern", pattern), lambda b, offset: utils.find_bytes(b, pattern, offset, alignment)
+
+        packed = struct.pack(struct_type, value)
+        return ("value", packed), lambda b, offset: self.find_typed_offsets(b, packed, offset, alignment)
+
+    @staticmethod
+    def typed_overlap(value, ftype):
+        """ number of bytes a match of value as ftype can spread over the next chunk """
+        struct_type, struct_len = utils.type_unpack(ftype)
+        if isinstance(value, (tuple, list)):
+            return struct_len * len(value) - 1
+        return struct_len - 1
+
+    def mem_scan(
         self,
         value,
-        ftype="match",
+        ftype="uint",
         protec=PAGE_READWRITE | PAGE_READONLY,
         optimizations=None,
         start_offset=None,
         end_offset=None,
+        alignment=None,
+        epsilon=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        cancel=None,
+        scope=None,
+        module=None,
     ):
         """
-                iterator returning all indexes where the pattern has been found
+                iterator returning, region by region, a numpy array of all the addresses holding value
+
+                float and double values are matched within +/- epsilon, or inside [lo, hi] when value is a
+                utils.FloatRange, a list of integers is searched as a contiguous pattern
+        """
+        _, match = self.typed_matcher(value, ftype, alignment, epsilon)
+
+        for offset, b, end in self.iter_windows(
+            protec=protec,
+            optimizations=optimizations,
+            scope=scope,
+            module=module,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            max_chunk_size=max_chunk_size,
+            cancel=cancel,
+            overlap=self.typed_overlap(value, ftype),
+        ):
+            hits = utils.clip_hits(match(b, offset), offset, end)
+            if len(hits):
+                yield hits
+
+    def mem_scan_types(
+        self,
+        value,
+        ftypes,
+        protec=PAGE_READWRITE | PAGE_READONLY,
+        optimizations=None,
+        start_offset=None,
+        end_offset=None,
+        alignment=None,
+        epsilon=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        cancel=None,
+        scope=None,
+        module=None,
+    ):
+        """
+                like mem_scan for several types at once, every region is read a single time and
+                (ftype, addresses) are yielded for each type, types unable to hold value are skipped
+        """
+        matchers = {}
+        for ftype in ftypes:
+            try:
+                matchers[ftype] = self.typed_matcher(value, ftype, alignment, epsilon)
+            except (struct.error, ValueError):
+                logger.debug("%s can't be searched as %s" % (value, ftype))
+
+        if not matchers:
+            return
+
+        for offset, b, end in self.iter_windows(
+            protec=protec,
+            optimizations=optimizations,
+            scope=scope,
+            module=module,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            max_chunk_size=max_chunk_size,
+            cancel=cancel,
+            overlap=max(self.typed_overlap(value, ftype) for ftype in matchers),
+        ):
+            cache = {}
+            for ftype, (key, match) in matchers.items():
+                if key not in cache:
+                    cache[key] = utils.clip_hits(match(b, offset), offset, end)
+                hits = cache[key]
+                if len(hits):
+                    yield ftype, hits
+
+    def sig_search(
+        self,
+        signatures,
+        module=None,
+        protec=PAGE_READABLE,
+        optimizations=None,
+        start_offset=None,
+        end_offset=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        cancel=None,
+        scope=None,
+    ):
         """
+                iterator returning (signature_id, address) for every occurrence of array of bytes signatures
+                like "48 8B 05 ?? ?? ?? ?? 89 ??", given as a single string, a list identified by index or a
+                {signature_id: signature} dict, all of them being searched during the same pass
 
-        # pre-compile regex to run faster
+                module restricts the search to the image of a module, like "kernel32.dll" or "libc.so.6"
+        """
+        if isinstance(signatures, (str, Signature)):
+            signatures = [signatures]
+        if not isinstance(signatures, dict):
+            signatures = dict(enumerate(signatures))
+        signatures = {
+            sig_id: sig if isinstance(sig, Signature) else Signature(sig)
+            for sig_id, sig in signatures.items()
+        }
+        if not signatures:
+            return
+
+        if module is not None:
+            entry = self.process.module_map.get(module)
+            if entry is None:
+                raise ProcessException("module %s not found" % module)
+            module_start, module_end = entry.base_addr, entry.base_addr + entry.base_size
+            # a module outside of every region would silently scope the search to nothing
+            if next(self.process.region_map.filter(start=module_start, end=module_end), None) is None:
+                raise ProcessException(
+                    "module %s (0x%X-0x%X) is not mapped by any region" % (module, module_start, module_end)
+                )
+            start_offset = module_start if start_offset is None else max(start_offset, module_start)
+            end_offset = module_end if end_offset is None else min(end_offset, module_end)
+
+        for offset, b, end in self.iter_windows(
+            protec=protec,
+            optimizations=optimizations,
+            scope=scope,
+            module=module,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            max_chunk_size=max_chunk_size,
+            cancel=cancel,
+            overlap=max(len(sig) for sig in signatures.values()) - 1,
+        ):
+            # the chunk is copied once so every signature anchors with bytes.find
+            b = bytes(b)
+            for sig_id, sig in signatures.items():
+                hits = sig.find(b, offset, end)
+                if start_offset is not None:
+                    hits = hits[hits >= start_offset]
+                if end_offset is not None:
+                    hits = hits[hits + len(sig) <= end_offset]
+                for soffset in hits.tolist():
+                    yield sig_id, self.address(soffset, "bytes")
+
+    def extract_strings(
+        self,
+        min_len=4,
+        encodings=("ascii", "utf-16-le"),
+        regions=None,
+        protec=PAGE_READABLE,
+        output=None,
+        workers=None,
+        pool="thread",
+        start_offset=None,
+        end_offset=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        cancel=None,
+        scope=None,
+        module=None,
+    ):
+        """
+                iterator returning (address, encoding, text) for every string of at least min_len printable
+                ASCII characters, encoded in ascii, utf-16-le or utf-32-le, like strings(1) over the process.
+                Strings are sorted by address inside every chunk, the ones crossing chunks are put back together
+
+                regions is an optional list of Region or (offset, size) extracted instead of the regions matching
+                protec, with workers chunks are handled by a pool like mem_search
+
+                with output (a path or a text file), the strings are written as "0x<address> <encoding> <text>"
+                lines instead and their number is returned
+        """
+        extractor = StringExtractor(min_len, encodings)
+        if workers:
+            results = parallel_scan(
+                self,
+                extractor_matcher,
+                (extractor,),
+                workers=workers,
+                pool=pool,
+                protec=protec,
+                start_offset=start_offset,
+                end_offset=end_offset,
+                max_chunk_size=max_chunk_size,
+                cancel=cancel,
+                regions=regions,
+                scope=scope,
+                module=module,
+            )
+        else:
+            results = (
+                res
+                for offset, b, _ in self.iter_windows(
+                    protec=protec,
+                    start_offset=start_offset,
+                    end_offset=end_offset,
+                    max_chunk_size=max_chunk_size,
+                    cancel=cancel,
+                    regions=regions,
+                    scope=scope,
+                    module=module,
+                )
+                for res in extractor.scan(b, offset)
+            )
+        strings = extractor.merge(results)
+        if output is None:
+            return strings
+
+        count = 0
+        f = open(output, "w", encoding="utf-8") if isinstance(output, str) else output
+        try:
+            for address, encoding, text in strings:
+                f.write("0x%X %s %s\n" % (address, encoding, text))
+                count += 1
+        finally:
+            if f is not output:
+                f.close()
+        return count
+
+    def search_matcher(self, value, ftype="match", alignment=None, epsilon=None, overlap=None):
+        """
+                return (match, overlap) where match(b, offset, end) iterates over the results of mem_search
+                in the chunk b read at offset, and overlap is the number of bytes a match can spread over
+                the next chunk
+        """
+        typed = False
+
+        # pre-compile regex to run faster, a list of regex is fused into a single one
         if ftype == "re" or ftype == "groups" or ftype == "ngroups":
+            if not isinstance(value, RegexSet):
+                value = RegexSet(value)
 
-            # value should be an array of regex
-            if type(value) is not list:
-                value = [value]
+        elif ftype in FLOAT_TYPES:
+            value = utils.float_bounds(value, ftype, epsilon)
 
-            tmp = []
-            for reg in value:
-                if type(reg) is tuple:
-                    name = reg[0]
-                    if type(reg[1]) != REGEX_TYPE:
-                        regex = re.compile(reg[1], re.IGNORECASE)
-                    else:
-                        regex = reg[1]
-                elif type(reg) == REGEX_TYPE:
-                    name = ""
-                    regex = reg
-                else:
-                    name = ""
-                    regex = re.compile(reg, re.IGNORECASE)
+        elif ftype == "multi":
+            if not isinstance(value, PatternSet):
+                value = PatternSet(value)
 
-                tmp.append((name, regex))
-            value = tmp
+        elif ftype == "str":
+            if not isinstance(value, StringPattern):
+                value = StringPattern(value)
 
         elif ftype not in ('match', 'group', 're', 'groups', 'ngroups', 'lambda'):
             struct_type, struct_len = utils.type_unpack(ftype)
@@ -185,6 +605,7 @@ class MemWorker:
                 value = b''.join([struct.pack(struct_type, v) for v in value])
             else:
                 value = struct.pack(struct_type, value)
+                typed = True
 
         # different functions avoid if statement before parsing the buffer
         if ftype == "re":
@@ -196,54 +617,118 @@ class MemWorker:
         elif ftype == "ngroups":
             func = self.parse_named_groups_function
 
-        elif ftype == "float":
-            func = self.parse_float_function
+        elif ftype in FLOAT_TYPES:
+            func = functools.partial(self.parse_float_function, alignment=alignment, data_type=ftype)
         elif ftype == "lambda":  # use a custom function
             func = value
+        elif ftype == "multi":
+            func = functools.partial(self.parse_multi_function, alignment=alignment)
+        elif ftype == "str":
+            func = functools.partial(self.parse_str_function, alignment=alignment)
+        elif typed:
+            # a single numeric value is compared to the whole buffer at once
+            func = functools.partial(self.parse_typed_function, alignment=alignment, data_type=ftype)
         else:
-            func = self.parse_any_function
+            func = functools.partial(self.parse_any_function, alignment=alignment)
+
+        if overlap is None:
+            if ftype in ("re", "groups", "ngroups"):
+                overlap = REGEX_OVERLAP
+            elif ftype in FLOAT_TYPES:
+                overlap = value[0].dtype.itemsize - 1
+            elif ftype == "lambda":
+                overlap = 0
+            elif ftype in ("multi", "str"):
+                overlap = value.max_length - 1
+            else:
+                overlap = max(len(value) - 1, 0)
 
-        if not self.process.isProcessOpen:
-            raise ProcessException(
-                "Can't read_bytes, process %s is not open" % self.process.pid
-            )
+        if ftype == "lambda":
+            # callbacks get their own copy of the chunk, the scan buffer is reused for the next one
+            return lambda b, offset, end=None: func(bytes(b), offset), overlap
+        return lambda b, offset, end=None: func(b, value, offset, end=end), overlap
 
-        for offset, chunk_size in self.process.iter_region(
-            start_offset=start_offset,
-            end_offset=end_offset,
+    def mem_search(
+        self,
+        value,
+        ftype="match",
+        protec=PAGE_READWRITE | PAGE_READONLY,
+        optimizations=None,
+        start_offset=None,
+        end_offset=None,
+        alignment=None,
+        epsilon=None,
+        max_chunk_size=MAX_CHUNK_SIZE,
+        overlap=None,
+        cancel=None,
+        workers=None,
+        pool="thread",
+        ordered=True,
+        scope=None,
+        module=None,
+    ):
+        """
+                iterator returning all indexes where the pattern has been found
+
+                regions are streamed through chunks of max_chunk_size bytes, overlapping by the length of the
+                pattern minus one so matches crossing a chunk boundary are found once. Regex matches are allowed
+                to spread over REGEX_OVERLAP bytes unless overlap is given, lambda functions receive a bytes copy of every chunk
+
+                alignment restricts hits of match and numeric types to addresses multiple of it,
+                an aligned scan of 4 or 8 bytes values touches 4 or 8 times fewer candidates
+
+                float and double values are matched within +/- epsilon, or inside [lo, hi] when value is a
+                utils.FloatRange
+
+                ftype="multi" searches a list (or a {pattern_id: pattern} dict, or a PatternSet) of byte
+                patterns at once, every region is read a single time and (pattern_id, address) are yielded
+
+                ftype="str" searches a string (or a StringPattern) in ascii, utf-8, utf-16-le and utf-32-le
+                at once and yields (encoding, address)
+
+                with workers, chunks are scanned in parallel by a pool of that many workers, pool="thread"
+                or "process" (faster for regex, lambda functions can't be sent to other processes), each of
+                them opening its own handle on the process. Results come in address order, or as soon as
+                they are found with ordered=False
+
+                scope="heap" (or "stack", "image", "mapped", "private") and module="game.exe" only read the regions
+                which can hold a match, the search skips everything else
+        """
+        match, overlap = self.search_matcher(value, ftype, alignment, epsilon, overlap)
+
+        if workers:
+            for res in parallel_search(
+                self,
+                value,
+                ftype,
+                workers=workers,
+                pool=pool,
+                ordered=ordered,
+                protec=protec,
+                optimizations=optimizations,
+                scope=scope,
+                module=module,
+                start_offset=start_offset,
+                end_offset=end_offset,
+                alignment=alignment,
+                epsilon=epsilon,
+                max_chunk_size=max_chunk_size,
+                overlap=overlap,
+                cancel=cancel,
+            ):
+                yield res
+            return
+
+        for offset, b, end in self.iter_windows(
             protec=protec,
             optimizations=optimizations,
+            scope=scope,
+            module=module,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            max_chunk_size=max_chunk_size,
+            cancel=cancel,
+            overlap=overlap,
         ):
-            b = b""
-            current_offset = offset
-            chunk_read = 0
-            chunk_exc = False
-            while chunk_read < chunk_size:
-                try:
-                    b += self.process.read_bytes(current_offset, chunk_size)
-                except IOError as e:
-                    print(traceback.format_exc())
-                    if e.errno == 13:
-                        raise
-                    else:
-                        logger.warning(e)
-                    chunk_exc = True
-                    break
-                except Exception as e:
-                    logger.warning(e)
-                    chunk_exc = True
-                    break
-                finally:
-                    current_offset += chunk_size
-                    chunk_read += chunk_size
-
-            if chunk_exc:
-                continue
-
-            if b:
-                if ftype == "lambda":
-                    for res in func(b, offset):
-                        yield res
-                else:
-                    for res in func(b, value, offset):
-                        yield res
+            for res in match(b, offset, end=end):
+                yield res
@@ -0,0 +1,231 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Parallel scans: the chunks of the regions are spread over a pool of threads or processes, every
+worker opens its own handle on the process and scans the chunks it receives with the same matcher as mem_search.
+"""
+
+import os
+import logging
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .Address import Address
+from .RegionMap import Region
+
+logger = logging.getLogger("memorpy3")
+
+# state of the current worker (thread or process)
+_worker = threading.local()
+
+_search_ids = itertools.count()
+
+
+class AddressRef:
+    """ an Address without its process, results cross the pool boundary as references """
+
+    __slots__ = ("value", "default_type")
+
+    def __init__(self, value, default_type):
+        self.value = value
+        self.default_type = default_type
+
+    def __reduce__(self):
+        return AddressRef, (self.value, self.default_type)
+
+
+def _detach(result):
+    if isinstance(result, Address):
+        return AddressRef(int(result), result.default_type)
+    if isinstance(result, tuple):
+        return tuple(_detach(item) for item in result)
+    return result
+
+
+def _attach(result, mw):
+    if isinstance(result, AddressRef):
+        return mw.address(result.value, result.default_type)
+    if isinstance(result, tuple):
+        return tuple(_attach(item, mw) for item in result)
+    return result
+
+
+def _init_worker(opener):
+    from .MemWorker import MemWorker
+
+    _worker.mw = MemWorker(process=opener())
+    _worker.buffer = bytearray(0)
+    _worker.search = None
+
+
+def search_matcher(mw, value, ftype, alignment, epsilon, overlap):
+    """ matcher of the scans run by parallel_search """
+    return mw.search_matcher(value, ftype, alignment, epsilon, overlap)[0]
+
+
+def _scan_chunk(task):
+    """ read one chunk with the handle of the worker and return the detached results of the search in it """
+    search, offset, length, end = task
+    mw = _worker.mw
+
+    # the matcher is built once per search and worker
+    if _worker.search is None or _worker.search[0] != search[0]:
+        search_id, factory, args = search
+        _worker.search = (search_id, factory(mw, *args))
+    match = _worker.search[1]
+
+    if len(_worker.buffer) < length:
+        _worker.buffer = bytearray(length)
+    try:
+        b = memoryview(_worker.buffer)[:mw.process.read_into(offset, memoryview(_worker.buffer)[:length])]
+    except Exception as e:
+        logger.warning(e)
+        return []
+
+    return [_detach(res) for res in match(b, offset, end=min(end, len(b)))]
+
+
+def iter_tasks(
+    mw, protec, optimizations, start_offset, end_offset, max_chunk_size, overlap, regions=None, scope=None, module=None
+):
+    """ yield (offset, length, end) for every chunk of the regions, like iter_windows without reading them """
+    if regions is None:
+        regions = mw.process.iter_region(
+            start_offset=start_offset,
+            end_offset=end_offset,
+            protec=protec,
+            optimizations=optimizations,
+            scope=scope,
+            module=module,
+        )
+    for region in regions:
+        region_offset, region_size = (region.base, region.size) if isinstance(region, Region) else region
+        region_end = region_offset + region_size
+        current_offset = region_offset
+        while current_offset < region_end:
+            chunk_size = min(max_chunk_size, region_end - current_offset)
+            yield current_offset, min(chunk_size + overlap, region_end - current_offset), chunk_size
+            current_offset += chunk_size
+
+
+def parallel_search(
+    mw,
+    value,
+    ftype,
+    workers=None,
+    pool="thread",
+    ordered=True,
+    protec=None,
+    optimizations=None,
+    start_offset=None,
+    end_offset=None,
+    alignment=None,
+    epsilon=None,
+    max_chunk_size=None,
+    overlap=0,
+    cancel=None,
+    scope=None,
+    module=None,
+):
+    """
+    iterator returning the results of mw.mem_search(value, ftype) computed by a pool of workers, in address
+    order when ordered is True, otherwise as soon as every chunk is done. A few chunks per worker are in
+    flight at any time so results are streamed without reading the whole process ahead
+    """
+    return parallel_scan(
+        mw,
+        search_matcher,
+        (value, ftype, alignment, epsilon, overlap),
+        workers=workers,
+        pool=pool,
+        ordered=ordered,
+        protec=protec,
+        optimizations=optimizations,
+        scope=scope,
+        module=module,
+        start_offset=start_offset,
+        end_offset=end_offset,
+        max_chunk_size=max_chunk_size,
+        overlap=overlap,
+        cancel=cancel,
+    )
+
+
+def parallel_scan(
+    mw,
+    factory,
+    args,
+    workers=None,
+    pool="thread",
+    ordered=True,
+    protec=None,
+    optimizations=None,
+    start_offset=None,
+    end_offset=None,
+    max_chunk_size=None,
+    overlap=0,
+    cancel=None,
+    regions=None,
+    scope=None,
+    module=None,
+):
+    """
+    iterator returning the results of match(b, offset, end) over every chunk, where every worker builds
+    match once with factory(worker_mw, *args), factory and args must be picklable for a process pool
+    """
+    workers = workers or os.cpu_count() or 1
+    if pool == "thread":
+        executor_class = ThreadPoolExecutor
+    elif pool == "process":
+        executor_class = ProcessPoolExecutor
+    else:
+        raise ValueError("unknown pool %r, expected 'thread' or 'process'" % pool)
+
+    search = (next(_search_ids), factory, args)
+    tasks = iter_tasks(
+        mw, protec, optimizations, start_offset, end_offset, max_chunk_size, overlap, regions, scope, module
+    )
+    max_pending = workers * 2
+
+    with executor_class(max_workers=workers, initializer=_init_worker, initargs=(mw.process.opener(),)) as executor:
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < max_pending and not (cancel is not None and cancel.is_set()):
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    pending.append(executor.submit(_scan_chunk, (search,) + task))
+                if not pending:
+                    break
+
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done = [future for future in pending if future in finished]
+                    for future in done:
+                        pending.remove(future)
+
+                for future in done:
+                    for res in future.result():
+                        yield _attach(res, mw)
+        finally:
+            for future in pending:
+                future.cancel()
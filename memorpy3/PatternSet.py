@@ -0,0 +1,118 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from . import utils
+
+
+class PatternSet:
+    """
+    a set of byte patterns compiled once and searched all together in a single pass over a buffer
+
+    the first bytes of every pattern (two of them, or one if a pattern is a single byte long) index a
+    lookup table, every position of the buffer is checked against it at once and the few candidates
+    left are verified against the patterns sharing their prefix only
+    """
+
+    def __init__(self, patterns):
+        """ patterns is a list of patterns identified by their index, or a dict {pattern_id: pattern} """
+        if isinstance(patterns, dict):
+            items = list(patterns.items())
+        else:
+            items = list(enumerate(patterns))
+        if not items:
+            raise ValueError("PatternSet needs at least one pattern")
+
+        self.ids = []
+        self.patterns = []
+        for pattern_id, pattern in items:
+            if isinstance(pattern, str):
+                pattern = pattern.encode()
+            pattern = bytes(pattern)
+            if not pattern:
+                raise ValueError("empty pattern %r" % (pattern_id,))
+            self.ids.append(pattern_id)
+            self.patterns.append(np.frombuffer(pattern, dtype=np.uint8))
+
+        self.min_length = min(len(pattern) for pattern in self.patterns)
+        self.max_length = max(len(pattern) for pattern in self.patterns)
+        self.width = 2 if self.min_length >= 2 else 1
+        self.dtype = np.dtype("<u2") if self.width == 2 else np.dtype(np.uint8)
+
+        self.table = np.zeros(1 << (8 * self.width), dtype=bool)
+        self.groups = {}
+        for index, pattern in enumerate(self.patterns):
+            key = int(np.frombuffer(pattern[:self.width].tobytes(), dtype=self.dtype)[0])
+            self.table[key] = True
+            self.groups.setdefault(key, []).append(index)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def find(self, b, address, alignment=None, end=None):
+        """
+        return (indexes, addresses), two arrays sorted by address giving the index of the pattern found
+        (self.ids[index] is its id) and its absolute address, overlapping occurrences are all reported,
+        occurrences starting at or after address + end are dropped
+        """
+        data = np.frombuffer(b, dtype=np.uint8)
+        empty = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.uint64)
+        if len(data) < self.min_length:
+            return empty
+
+        positions = []
+        keys = []
+        for offset, stride, view in utils.iter_aligned_views(b, self.dtype, address, alignment):
+            if len(view):
+                found = np.flatnonzero(self.table[view])
+                positions.append(found * stride + offset)
+                keys.append(view[found])
+
+        positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.intp)
+        if not len(positions):
+            return empty
+        keys = np.concatenate(keys)
+        if end is not None:
+            keep = positions < end
+            positions, keys = positions[keep], keys[keep]
+
+        order = np.argsort(keys, kind="stable")
+        positions, keys = positions[order], keys[order]
+
+        indexes = []
+        hits = []
+        for key in np.unique(keys).tolist():
+            first = np.searchsorted(keys, key, side="left")
+            last = np.searchsorted(keys, key, side="right")
+            candidates = positions[first:last]
+            for index in self.groups[key]:
+                pattern = self.patterns[index]
+                found = candidates[candidates + len(pattern) <= len(data)]
+                for k in range(self.width, len(pattern)):
+                    if not len(found):
+                        break
+                    found = found[data[found + k] == pattern[k]]
+                if len(found):
+                    indexes.append(np.full(len(found), index, dtype=np.intp))
+                    hits.append(found)
+
+        if not hits:
+            return empty
+        indexes = np.concatenate(indexes)
+        hits = np.concatenate(hits).astype(np.uint64) + np.uint64(address)
+        order = np.lexsort((indexes, hits))
+        return indexes[order], hits[order]
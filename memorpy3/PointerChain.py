@@ -0,0 +1,185 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+from .Address import Address, AddressException
+from .PointerScan import PointerPath
+
+BASE_RE = re.compile(r"^(?P<module>.+?)\s*\+\s*(?P<offset>(0x)?[0-9a-fA-F]+)$")
+
+
+def parse_base(base):
+    """ return (module, offset) from "module+0x1234", "module" or an absolute address (module is None) """
+    if isinstance(base, int):
+        return None, base
+
+    base = base.strip()
+    try:
+        return None, int(base, 0)
+    except ValueError:
+        pass
+
+    m = BASE_RE.match(base)
+    if m:
+        return m.group("module"), int(m.group("offset"), 16)
+    return base, 0
+
+
+class PointerChain(Address):
+    """
+    an address reached by following pointers, like "game.exe+0x1234 -> 0x10 -> 0x8": read the pointer at
+    game.exe+0x1234, add 0x10, read the pointer there and add 0x8. The chain is resolved again when its
+    resolver moves to a new generation, until then reading or writing it costs no pointer read
+
+    the chain is given as a string, a PointerPath or a (base, offset, offset...) tuple where base is an
+    absolute address or a "module+0x1234" string
+    """
+
+    def __init__(self, chain, process, default_type="uint", resolver=None):
+        if isinstance(chain, PointerChain):
+            module, offset, offsets = chain.module, chain.offset, list(chain.offsets)
+        elif isinstance(chain, PointerPath):
+            module, offset, offsets = chain.module, chain.offset, list(chain.offsets)
+        elif isinstance(chain, str):
+            tokens = [token.strip() for token in chain.split("->")]
+            module, offset = parse_base(tokens[0])
+            offsets = [int(token, 0) for token in tokens[1:]]
+        else:
+            module, offset = parse_base(chain[0])
+            offsets = [int(o) for o in chain[1:]]
+
+        self.module = module
+        self.offset = offset
+        self.offsets = offsets
+        self.process = process
+        self.default_type = default_type
+        self.symbolic_name = None
+        self.resolver = resolver if resolver is not None else PointerResolver(process)
+        self.resolved = None
+        self.generation = None
+
+    @property
+    def value(self):
+        """ the address the chain leads to, resolved once per generation of its resolver """
+        if self.generation != self.resolver.generation:
+            self.resolver.resolve([self])
+        if self.resolved is None:
+            raise AddressException("can't resolve %s" % self.chain)
+        return self.resolved
+
+    @property
+    def chain(self):
+        if self.module is None:
+            base = "0x%X" % self.offset
+        else:
+            base = "%s+0x%X" % (self.module, self.offset)
+        return base + "".join(" -> %s0x%X" % ("-" if o < 0 else "", abs(o)) for o in self.offsets)
+
+    def __add__(self, other):
+        chain = PointerChain(self, self.process, self.default_type, self.resolver)
+        if chain.offsets:
+            chain.offsets[-1] += int(other)
+        else:
+            chain.offset += int(other)
+        return chain
+
+    def __sub__(self, other):
+        return self + -int(other)
+
+    def __repr__(self):
+        return "<PointerChain: %s>" % self.chain
+
+
+class PointerResolver:
+    """
+    resolve many pointer chains together: every level of pointers is read with a single batched read,
+    chains sharing a prefix read it once, and the pointers read are cached for lifetime generations
+
+    call new_generation() every time the values should be refreshed (each frame, each tick ...),
+    pointers which rarely change can be kept longer with a greater lifetime
+    """
+
+    def __init__(self, process, lifetime=1):
+        self.process = process
+        self.lifetime = lifetime
+        self.generation = 0
+        self.cache = {}
+
+    def new_generation(self):
+        """ forget the resolved chains, and the pointers read more than lifetime generations ago """
+        self.generation += 1
+        self.cache = {
+            address: (value, generation)
+            for address, (value, generation) in self.cache.items()
+            if self.generation - generation < self.lifetime
+        }
+        return self.generation
+
+    def invalidate(self):
+        self.cache = {}
+        self.generation += 1
+
+    def resolve(self, chains):
+        """ resolve chains (PointerChain objects) and return their addresses, None for a broken chain """
+        modules = {}
+        current = []
+        for chain in chains:
+            if chain.module is None:
+                current.append(chain.offset)
+                continue
+            if chain.module not in modules:
+                modules[chain.module] = self.process.module_map.get(chain.module)
+            module = modules[chain.module]
+            current.append(None if module is None else module.base_addr + chain.offset)
+
+        depth = max((len(chain.offsets) for chain in chains), default=0)
+        for hop in range(depth):
+            pending = [
+                i for i, chain in enumerate(chains)
+                if current[i] is not None and hop < len(chain.offsets)
+            ]
+            pointers = self.read_pointers(set(current[i] for i in pending))
+            for i in pending:
+                pointer = pointers.get(current[i])
+                current[i] = pointer + chains[i].offsets[hop] if pointer else None
+
+        for chain, address in zip(chains, current):
+            chain.resolved = address
+            chain.generation = self.generation
+        return current
+
+    def read_pointers(self, addresses):
+        """ return {address: pointer} for addresses, reading only the pointers missing from the cache """
+        pointers = {}
+        missing = []
+        for address in addresses:
+            cached = self.cache.get(address)
+            if cached is not None:
+                pointers[address] = cached[0]
+            else:
+                missing.append(address)
+        if not missing:
+            return pointers
+
+        data_type = "ulonglong" if self.process.is_64bit() else "uint"
+        values = self.process.read_many([(address, data_type) for address in missing])
+        for address, pointer in zip(missing, values):
+            if pointer is not None:
+                pointers[address] = pointer
+                self.cache[address] = (pointer, self.generation)
+
+        return pointers
@@ -0,0 +1,221 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from . import utils
+from .MemoryConstants import PAGE_READONLY, PAGE_READWRITE, PAGE_WRITECOPY, PAGE_READABLE
+
+logger = logging.getLogger("memorpy3")
+
+# regions holding the pointers, code is left out
+POINTER_PROTEC = PAGE_READONLY | PAGE_READWRITE | PAGE_WRITECOPY
+
+
+@dataclass
+class PointerPath:
+    """
+    a static pointer path leading to an address: read the pointer at module+offset, add offsets[0],
+    read the pointer there, add offsets[1] ... the last offset gives the address itself
+    """
+
+    # The name of the module holding the first pointer.
+    module: str
+
+    # The offset of the first pointer from the base of the module.
+    offset: int
+
+    # The offsets added to every pointer along the path.
+    offsets: List[int] = field(default_factory=list)
+
+    def __str__(self):
+        return "%s+0x%X" % (self.module, self.offset) + "".join(" -> +0x%X" % o for o in self.offsets)
+
+    def resolve(self, process):
+        """ follow the path in process and return the address it leads to """
+        module = process.module_map.get(self.module)
+        if module is None:
+            raise ValueError("module %s not found" % self.module)
+
+        if process.region_map.find(module.base_addr) is None:
+            raise ValueError("module %s base 0x%X is not mapped by any region" % (self.module, module.base_addr))
+
+        data_type = "ulonglong" if process.is_64bit() else "uint"
+        address = module.base_addr + self.offset
+        for offset in self.offsets:
+            address = process.read(address, data_type) + offset
+        return address
+
+
+class PointerIndex:
+    """
+    every aligned pointer sized value of a process pointing into one of its regions, stored as two
+    arrays sorted by the value pointed to so all the pointers to a range of addresses are found with
+    a binary search
+
+    the index is a copy of the process at the time it was built, build another one once the pointers changed
+    """
+
+    def __init__(self, process, values, addresses, pointer_size):
+        self.process = process
+        self.values = values
+        self.addresses = addresses
+        self.pointer_size = pointer_size
+
+    @classmethod
+    def build(cls, mw, protec=POINTER_PROTEC, start_offset=None, end_offset=None, alignment=None, **kwargs):
+        """ index the pointers held by the regions of mw matching protec, aligned on the pointer size by default """
+        process = mw.process
+        pointer_size = 8 if process.is_64bit() else 4
+        dtype = utils.uint_dtype(pointer_size)
+        alignment = alignment or pointer_size
+
+        # merge contiguous readable regions, a pointer may point into any of them
+        starts, ends = [], []
+        for region in process.region_map.filter(protec=PAGE_READABLE):
+            if ends and ends[-1] == region.base:
+                ends[-1] = region.end
+            else:
+                starts.append(region.base)
+                ends.append(region.end)
+        starts = np.array(starts, dtype=dtype)
+        ends = np.array(ends, dtype=dtype)
+
+        values, addresses = [], []
+        if len(starts):
+            lowest, highest = starts[0], ends[-1]
+            # the overlap lets a pointer straddling two chunks be read in full, it belongs to the first one
+            for offset, b, end in mw.iter_windows(
+                protec=protec, start_offset=start_offset, end_offset=end_offset, overlap=pointer_size - 1, **kwargs
+            ):
+                for phase, stride, view in utils.iter_aligned_views(b, dtype, offset, alignment):
+                    # most values are not pointers at all, drop them before the binary search
+                    found = np.flatnonzero((view >= lowest) & (view < highest))
+                    if not len(found):
+                        continue
+                    candidates = view[found]
+                    index = np.searchsorted(starts, candidates, side="right") - 1
+                    valid = candidates < ends[index]
+                    found_addresses = found[valid].astype(np.uint64) * np.uint64(stride) + np.uint64(offset + phase)
+                    # the addresses are sorted, those clipped off are the pointers starting in the next chunk
+                    kept = len(utils.clip_hits(found_addresses, offset, end))
+                    values.append(candidates[valid][:kept].astype(np.uint64))
+                    addresses.append(found_addresses[:kept])
+
+        values = np.concatenate(values) if values else np.empty(0, dtype=np.uint64)
+        addresses = np.concatenate(addresses) if addresses else np.empty(0, dtype=np.uint64)
+        order = np.argsort(values, kind="stable")
+        return cls(process, values[order], addresses[order], pointer_size)
+
+    def __len__(self):
+        return len(self.values)
+
+    def pointers_to(self, lo, hi):
+        """ return (addresses, values) of the pointers whose value is in [lo, hi] """
+        first = np.searchsorted(self.values, np.uint64(lo), side="left")
+        last = np.searchsorted(self.values, np.uint64(hi), side="right")
+        return self.addresses[first:last], self.values[first:last]
+
+    def _links(self, nodes, max_offset):
+        """
+        return (pointers, nodes, offsets) for every pointer whose value plus an offset in [0, max_offset]
+        is one of nodes, sorted by pointer address
+        """
+        lows = nodes - np.minimum(nodes, np.uint64(max_offset))
+        first = np.searchsorted(self.values, lows, side="left")
+        last = np.searchsorted(self.values, nodes, side="right")
+        counts = last - first
+        total = int(counts.sum())
+        if not total:
+            empty = np.empty(0, dtype=np.uint64)
+            return empty, empty, empty
+
+        # expand every [first, last) range into the indexes of the pointers it holds
+        indexes = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(total)
+        pointers = self.addresses[indexes]
+        targets = np.repeat(nodes, counts)
+        offsets = targets - self.values[indexes]
+
+        order = np.argsort(pointers, kind="stable")
+        return pointers[order], targets[order], offsets[order]
+
+    def mapped_modules(self):
+        """ return the modules whose base lies in a region of the process, the only ones able to hold roots """
+        modules = self.process.module_map.get_modules()
+        mapped = [module for module in modules if self.process.region_map.find(module.base_addr) is not None]
+        if len(mapped) < len(modules):
+            logger.warning(
+                "%d modules are not mapped by any region, their pointers can't be roots: %s"
+                % (len(modules) - len(mapped), ", ".join(module.name for module in modules if module not in mapped))
+            )
+        return mapped
+
+    def scan(self, address, depth=4, max_offset=0x1000, max_results=None):
+        """
+        iterator returning the PointerPath leading to address through at most depth pointers, each
+        one pointing at most max_offset bytes before the next step, shortest paths first
+
+        the search walks backward from address one level at a time, every address reached is only
+        expanded once (at its shortest depth) and pointers held by a module are the roots of the paths
+        """
+        modules = self.mapped_modules()
+        module_bases = np.array([module.base_addr for module in modules], dtype=np.uint64)
+        module_ends = np.array([module.base_addr + module.base_size for module in modules], dtype=np.uint64)
+
+        levels = []
+        visited = np.array([address], dtype=np.uint64)
+        nodes = visited
+        results = 0
+
+        for level in range(depth):
+            if not len(nodes):
+                break
+            pointers, targets, offsets = self._links(nodes, max_offset)
+
+            index = np.searchsorted(module_bases, pointers, side="right") - 1
+            static = index >= 0
+            static[static] = pointers[static] < module_ends[index[static]]
+            levels.append((pointers, targets, offsets))
+
+            for position in np.flatnonzero(static).tolist():
+                module = modules[index[position]]
+                pointer = int(pointers[position])
+                for rest in self._paths(levels, level - 1, int(targets[position])):
+                    yield PointerPath(module.name, pointer - module.base_addr, [int(offsets[position])] + rest)
+                    results += 1
+                    if max_results is not None and results >= max_results:
+                        return
+
+            # pointers out of the modules are the addresses to reach at the next level
+            nodes = np.setdiff1d(np.unique(pointers[~static]), visited, assume_unique=True)
+            visited = np.union1d(visited, nodes)
+
+    def _paths(self, levels, level, node):
+        """ yield the offsets leading from the pointer at node down to the scanned address """
+        if level < 0:
+            yield []
+            return
+
+        pointers, targets, offsets = levels[level]
+        first = np.searchsorted(pointers, np.uint64(node), side="left")
+        last = np.searchsorted(pointers, np.uint64(node), side="right")
+        for position in range(first, last):
+            for rest in self._paths(levels, level - 1, int(targets[position])):
+                yield [int(offsets[position])] + rest
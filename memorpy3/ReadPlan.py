@@ -0,0 +1,93 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from . import utils
+
+
+class ReadPlan:
+    """
+    many values read with a few range reads: values less than gap bytes apart are read together,
+    in ranges of at most max_read bytes, see utils.coalesce_spans
+
+    a range crossing memory unmapped since the plan was made comes back short, the values it lost are
+    read again page by page. The plan only depends on the addresses, keep it to read them again
+    """
+
+    def __init__(self, addresses, sizes, gap=utils.PAGE_SIZE, max_read=1 << 20):
+        """ addresses may come in any order, sizes is a size in bytes for every value or a single one for all """
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), addresses.shape)
+        self.count = len(addresses)
+        self.sizes = np.array(sizes)
+        # where the bytes of every value start in the raw array returned by read, in the order of addresses
+        self.starts = np.cumsum(self.sizes) - self.sizes
+
+        order = np.argsort(addresses, kind="stable")
+        sorted_addresses = addresses[order]
+        sorted_sizes = self.sizes[order]
+        groups = utils.coalesce_spans(sorted_addresses, sorted_sizes, gap, max_read)
+        self.ranges = [(start, length) for start, length, _, _ in groups]
+
+        lengths = np.array([length for _, length in self.ranges], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        # group of every value and where it lies in the concatenation of the ranges
+        self.group_of = np.empty(self.count, dtype=np.int64)
+        self.relative = np.empty(self.count, dtype=np.int64)
+        # values sharing their range with others are worth a second read when the range comes back short
+        self.shared = np.empty(self.count, dtype=bool)
+        for g, (start, _, first, last) in enumerate(groups):
+            indexes = order[first:last]
+            self.group_of[indexes] = g
+            self.relative[indexes] = (addresses[indexes] - np.uint64(start)).astype(np.int64)
+            self.shared[indexes] = last - first > 1
+        self.addresses = addresses
+
+        # every byte of every value, gathered from the concatenated ranges with a single fancy indexing
+        positions = self.offsets[self.group_of] + self.relative
+        self.gather = np.repeat(positions - self.starts, self.sizes) + np.arange(int(self.sizes.sum()), dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def read(self, process, retry=True):
+        """
+        read every value with process.read_ranges, return (raw, lengths) where raw is an uint8 array holding
+        the bytes of every value one after the other (see starts) and lengths the number of bytes read of each
+        """
+        if not self.count:
+            return np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.int64)
+
+        datas = process.read_ranges(self.ranges)
+        buffer = np.zeros(int(self.offsets[-1]), dtype=np.uint8)
+        read = np.empty(len(datas), dtype=np.int64)
+        for g, data in enumerate(datas):
+            buffer[self.offsets[g]: self.offsets[g] + len(data)] = np.frombuffer(data, dtype=np.uint8)
+            read[g] = len(data)
+
+        raw = buffer[self.gather]
+        lengths = np.clip(read[self.group_of] - self.relative, 0, self.sizes)
+
+        missing = np.flatnonzero((lengths < self.sizes) & self.shared) if retry else ()
+        if len(missing):
+            plan = ReadPlan(self.addresses[missing], self.sizes[missing], gap=0, max_read=utils.PAGE_SIZE)
+            retried, retried_lengths = plan.read(process, retry=False)
+            raw[np.repeat(self.starts[missing] - plan.starts, plan.sizes) + np.arange(len(retried))] = retried
+            lengths[missing] = retried_lengths
+
+        return raw, lengths
@@ -0,0 +1,241 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import string
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# flags which can be scoped to a part of a bytes pattern, (?i:...)
+SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+# numbered backreferences and conditionals break once the groups of a pattern are renumbered
+NUMBERED_RE = re.compile(rb"\\[1-9]|\(\?\(\d")
+
+REGEX_TYPE = type(re.compile("^plop$"))
+
+# name of the group wrapping every alternative of the fused pattern
+ALTERNATIVE_GROUP = "_memorpy_%d"
+
+
+CATEGORY_BYTES = {
+    sre_constants.CATEGORY_DIGIT: set(string.digits.encode()),
+    sre_constants.CATEGORY_SPACE: set(string.whitespace.encode()),
+    sre_constants.CATEGORY_WORD: set((string.ascii_letters + string.digits + "_").encode()),
+}
+CATEGORY_BYTES[sre_constants.CATEGORY_NOT_DIGIT] = set(range(256)) - CATEGORY_BYTES[sre_constants.CATEGORY_DIGIT]
+CATEGORY_BYTES[sre_constants.CATEGORY_NOT_SPACE] = set(range(256)) - CATEGORY_BYTES[sre_constants.CATEGORY_SPACE]
+CATEGORY_BYTES[sre_constants.CATEGORY_NOT_WORD] = set(range(256)) - CATEGORY_BYTES[sre_constants.CATEGORY_WORD]
+
+REPEATS = tuple(
+    getattr(sre_constants, op) for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(sre_constants, op)
+)
+
+
+def _fold(byte_set, flags):
+    if flags & re.IGNORECASE:
+        byte_set = byte_set | {ord(chr(c).swapcase()) for c in byte_set if chr(c) in string.ascii_letters}
+    return byte_set
+
+
+def _first(items, flags):
+    """ return (bytes, nullable): the bytes a match of the sequence items can start with, and if it can be empty """
+    first = set()
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            return first | _fold({av}, flags), False
+        elif op is sre_constants.IN:
+            byte_set = set()
+            for set_op, set_av in av:
+                if set_op is sre_constants.LITERAL:
+                    byte_set.add(set_av)
+                elif set_op is sre_constants.RANGE:
+                    byte_set.update(range(set_av[0], set_av[1] + 1))
+                elif set_op is sre_constants.CATEGORY and set_av in CATEGORY_BYTES:
+                    byte_set |= CATEGORY_BYTES[set_av]
+                else:
+                    # negated or unknown set
+                    return None, False
+            return first | _fold(byte_set, flags), False
+        elif op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            sub_first, nullable = _first(sub, (flags | add_flags) & ~del_flags)
+        elif op is sre_constants.BRANCH:
+            sub_first, nullable = set(), False
+            for branch in av[1]:
+                branch_first, branch_nullable = _first(branch, flags)
+                if branch_first is None:
+                    return None, False
+                sub_first |= branch_first
+                nullable = nullable or branch_nullable
+        elif op in REPEATS:
+            sub_first, nullable = _first(av[2], flags)
+            nullable = nullable or av[0] == 0
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            sub_first, nullable = _first(av, flags)
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            # zero width, the match starts with what follows
+            continue
+        else:
+            return None, False
+
+        if sub_first is None:
+            return None, False
+        first |= sub_first
+        if not nullable:
+            return first, False
+    return first, True
+
+
+def first_bytes(regex):
+    """ the set of bytes every match of the compiled bytes regex starts with, None when it can start with any """
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+        first, nullable = _first(parsed.data, parsed.state.flags)
+    except Exception:
+        return None
+    if first is None or nullable or len(first) == 256:
+        return None
+    return first
+
+
+def compile_bytes(pattern, flags=re.IGNORECASE):
+    """ compile pattern to run on bytes, str patterns (compiled or not) are encoded to utf-8 """
+    if isinstance(pattern, REGEX_TYPE):
+        if isinstance(pattern.pattern, bytes):
+            return pattern
+        flags = pattern.flags & ~re.UNICODE
+        pattern = pattern.pattern
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+    return re.compile(bytes(pattern), flags)
+
+
+class RegexSet:
+    """
+    a list of regex searched directly in bytes or memoryview chunks, fused into a single alternation
+    (?P<_memorpy_0>regex0)|(?P<_memorpy_1>regex1)... so a chunk is scanned once whatever the number of
+    regex, the group wrapping the match gives back the regex it comes from
+
+    like any alternation, matches of the fused regex don't overlap and the first regex matching at a
+    position wins. Regex using numbered backreferences, or named groups already used by another regex,
+    are kept apart and run on their own
+    """
+
+    def __init__(self, patterns, flags=re.IGNORECASE):
+        """
+        patterns is a regex, or a list of regex and (name, regex) tuples, str and bytes patterns
+        are compiled with flags, the name of a regex given alone is ""
+        """
+        if not isinstance(patterns, list):
+            patterns = [patterns]
+
+        self.names = []
+        self.regex = []
+        for pattern in patterns:
+            name = ""
+            if isinstance(pattern, tuple):
+                name, pattern = pattern
+            self.names.append(name)
+            self.regex.append(compile_bytes(pattern, flags))
+
+        self.fused = None
+        self.alternatives = {}
+        self.spans = {}
+        self.apart = list(range(len(self.regex)))
+        if len(self.regex) > 1:
+            self._fuse()
+
+    def __len__(self):
+        return len(self.regex)
+
+    def _fuse(self):
+        fusable = [
+            index for index, regex in enumerate(self.regex)
+            if not (regex.groups and NUMBERED_RE.search(regex.pattern))
+        ]
+        if len(fusable) < 2:
+            return
+
+        parts = []
+        alternatives = {}
+        spans = {}
+        group = 1
+        for index in fusable:
+            regex = self.regex[index]
+            scoped = "".join(letter for flag, letter in SCOPED_FLAGS if regex.flags & flag)
+            prefix = b"(?%s:" % scoped.encode() if scoped else b"(?:"
+            parts.append(b"(?P<%s>%s%s))" % ((ALTERNATIVE_GROUP % index).encode(), prefix, regex.pattern))
+            # the groups of the regex follow the group wrapping it
+            alternatives[group] = index
+            spans[index] = (group, group + regex.groups)
+            group += 1 + regex.groups
+
+        pattern = b"|".join(parts)
+
+        # scanning an alternation tries every regex at every position, a lookahead on the bytes
+        # the regex can start with lets the engine skip most positions at once
+        starts = [first_bytes(self.regex[index]) for index in fusable]
+        if all(start is not None for start in starts):
+            allowed = b"".join(b"\\x%02x" % byte for byte in sorted(set().union(*starts)))
+            pattern = b"(?=[%s])(?:%s)" % (allowed, pattern)
+
+        try:
+            fused = re.compile(pattern)
+        except re.error:
+            # named groups used by several regex
+            return
+
+        self.fused = fused
+        self.alternatives = alternatives
+        self.spans = spans
+        self.apart = [index for index in range(len(self.regex)) if index not in set(fusable)]
+
+    def finditer(self, b, end=None):
+        """
+        yield (index, match) for the matches of the regex in b, self.names[index] is the name of the regex,
+        matches starting at or after end are dropped
+        """
+        if self.fused is not None:
+            for match in self.fused.finditer(b):
+                if end is not None and match.start() >= end:
+                    break
+                # the wrapping group closes last, it is the last index of the match
+                yield self.alternatives[match.lastindex], match
+
+        for index in self.apart:
+            for match in self.regex[index].finditer(b):
+                if end is not None and match.start() >= end:
+                    break
+                yield index, match
+
+    def groups(self, index, match):
+        """ the groups of match as returned by the regex index on its own """
+        if match.re is not self.fused:
+            return match.groups()
+        start, stop = self.spans[index]
+        return match.groups()[start:stop]
+
+    def groupdict(self, index, match):
+        """ the named groups of match as returned by the regex index on its own """
+        if match.re is not self.fused:
+            return match.groupdict()
+        groupdict = match.groupdict()
+        return {name: groupdict[name] for name in self.regex[index].groupindex}
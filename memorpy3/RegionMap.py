@@ -0,0 +1,271 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .MemoryConstants import (
+    PAGE_GUARD,
+    PAGE_NOCACHE,
+    PAGE_WRITECOMBINE,
+    MEM_COMMIT,
+    MEM_PRIVATE,
+    MEM_MAPPED,
+    MEM_IMAGE,
+)
+
+# names of the scopes regions can be filtered on, heap regions are the private ones which aren't a thread stack
+REGION_SCOPES = ("heap", "stack", "image", "mapped", "private")
+
+# seconds a region map is trusted before being walked again
+REGION_MAP_TTL = 1.0
+
+
+@dataclass
+class Region:
+    """a contiguous range of pages sharing the same attributes"""
+
+    # The first address of the region.
+    base: int
+
+    # The size of the region, in bytes.
+    size: int
+
+    # The protection of the pages, as a PAGE_* bitmask.
+    protect: int
+
+    # MEM_COMMIT or MEM_RESERVE.
+    state: int
+
+    # MEM_PRIVATE, MEM_MAPPED or MEM_IMAGE.
+    type: int
+
+    # The name of the module the region belongs to, if any.
+    module: Optional[str] = None
+
+    # True when the region holds the stack of a thread.
+    stack: bool = False
+
+    @property
+    def end(self):
+        return self.base + self.size
+
+    @property
+    def kind(self):
+        """ "stack", "heap", "image" or "mapped" """
+        if self.stack:
+            return "stack"
+        if self.type == MEM_IMAGE:
+            return "image"
+        if self.type == MEM_MAPPED:
+            return "mapped"
+        return "heap"
+
+    def in_scope(self, scope):
+        """ True if the region belongs to scope, one of REGION_SCOPES or a list of them """
+        if not isinstance(scope, str):
+            return any(self.in_scope(name) for name in scope)
+        if scope not in REGION_SCOPES:
+            raise ValueError("unknown scope %r, expected one of %s" % (scope, ", ".join(REGION_SCOPES)))
+        if scope == "private":
+            return self.type == MEM_PRIVATE
+        return self.kind == scope
+
+    def in_module(self, name):
+        """ True if the region belongs to the module called name (case insensitive, the extension may be omitted) """
+        if self.module is None:
+            return False
+        module = self.module.lower()
+        name = name.lower()
+        return module == name or module.startswith(name + ".")
+
+    def __contains__(self, address):
+        return self.base <= int(address) < self.base + self.size
+
+
+@dataclass
+class Module:
+    """a module loaded in a process, with the same attributes as the backends module entries"""
+
+    # The module name.
+    name: str
+
+    # The module path.
+    path: str
+
+    # The base address of the module.
+    base_addr: int
+
+    # The size of the module, in bytes.
+    base_size: int
+
+
+class RegionMap:
+    """
+    sorted list of the regions of a process, walked once and reused by every search until it is
+    refreshed explicitly or becomes older than ttl seconds (never with ttl=None)
+    """
+
+    def __init__(self, process, ttl=REGION_MAP_TTL):
+        self.process = process
+        self.ttl = ttl
+        self.regions = []
+        self.bases = []
+        self.timestamp = None
+
+    def refresh(self):
+        self.regions = sorted(self.process.query_regions(), key=lambda region: region.base)
+        self.bases = [region.base for region in self.regions]
+        self.timestamp = time.monotonic()
+        return self
+
+    def invalidate(self):
+        self.timestamp = None
+
+    @property
+    def stale(self):
+        if self.timestamp is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self.timestamp > self.ttl
+
+    def get_regions(self):
+        if self.stale:
+            self.refresh()
+        return self.regions
+
+    def find(self, address):
+        """ return the region holding address or None """
+        regions = self.get_regions()
+        index = bisect.bisect_right(self.bases, int(address)) - 1
+        if index >= 0 and int(address) in regions[index]:
+            return regions[index]
+        return None
+
+    def filter(self, protec=None, module=None, start=None, end=None, state=MEM_COMMIT, scope=None):
+        """
+        yield the regions overlapping [start, end) which are in state, readable with one of the protec
+        flags (guard, no-cache and write-combine pages are excluded), belong to module and are in scope
+        (see Region.in_scope) when given
+        """
+        regions = self.get_regions()
+        index = 0
+        if start is not None:
+            index = max(bisect.bisect_right(self.bases, start) - 1, 0)
+
+        for region in regions[index:]:
+            if end is not None and region.base >= end:
+                break
+            if start is not None and region.end <= start:
+                continue
+            if state is not None and not region.state & state:
+                continue
+            if protec:
+                if (
+                    not region.protect & protec
+                    or region.protect & PAGE_NOCACHE
+                    or region.protect & PAGE_WRITECOMBINE
+                    or region.protect & PAGE_GUARD
+                ):
+                    continue
+            if module is not None and not region.in_module(module):
+                continue
+            if scope is not None and not region.in_scope(scope):
+                continue
+            yield region
+
+    def __iter__(self):
+        return iter(self.get_regions())
+
+    def __len__(self):
+        return len(self.get_regions())
+
+
+class ModuleMap:
+    """
+    modules of a process sorted by base address for O(log n) lookups, the module list is only
+    taken again when the image regions of the region map change (a module has been loaded or unloaded)
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.modules = []
+        self.base_list = []
+        self.bases = np.empty(0, dtype=np.uint64)
+        self.ends = np.empty(0, dtype=np.uint64)
+        self.signature = None
+        self.timestamp = None
+
+    def refresh(self, signature=None):
+        self.modules = sorted(self.process.get_modules().values(), key=lambda module: module.base_addr)
+        self.base_list = [module.base_addr for module in self.modules]
+        self.bases = np.array(self.base_list, dtype=np.uint64)
+        self.ends = np.array([module.base_addr + module.base_size for module in self.modules], dtype=np.uint64)
+        self.signature = signature
+        return self
+
+    def invalidate(self):
+        self.signature = None
+        self.timestamp = None
+
+    def get_modules(self):
+        region_map = self.process.region_map
+        region_map.get_regions()
+        if self.timestamp is None or self.timestamp != region_map.timestamp:
+            signature = tuple((region.base, region.size) for region in region_map.regions if region.type == MEM_IMAGE)
+            if self.timestamp is None or signature != self.signature:
+                self.refresh(signature)
+            self.timestamp = region_map.timestamp
+        return self.modules
+
+    def find(self, address):
+        """ return the module holding address or None """
+        modules = self.get_modules()
+        index = bisect.bisect_right(self.base_list, int(address)) - 1
+        if index >= 0 and int(address) < modules[index].base_addr + modules[index].base_size:
+            return modules[index]
+        return None
+
+    def get(self, name):
+        """ return the module called name (case insensitive, the extension may be omitted) or None """
+        name = name.lower()
+        for module in self.get_modules():
+            if module.name.lower() == name or module.name.lower().startswith(name + "."):
+                return module
+        return None
+
+    def symbolize(self, addresses):
+        """ return the symbolic names of many addresses at once, like module.dll+0x00001234 """
+        modules = self.get_modules()
+        if not isinstance(addresses, np.ndarray):
+            addresses = [int(address) for address in addresses]
+        addresses = np.asarray(addresses, dtype=np.uint64)
+
+        indexes = np.searchsorted(self.bases, addresses, side="right") - 1
+        inside = indexes >= 0
+        inside[inside] = addresses[inside] < self.ends[indexes[inside]]
+
+        names = []
+        for address, index, found in zip(addresses.tolist(), indexes.tolist(), inside.tolist()):
+            if found:
+                module = modules[index]
+                names.append('%s+0x%08X' % (module.name, address - module.base_addr))
+            else:
+                names.append('0x%08X' % address)
+        return names
@@ -0,0 +1,114 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+WILDCARDS = ("?", "??", "*", "**")
+
+
+class Signature:
+    """
+    an array of bytes signature in the IDA / Cheat Engine format, like "48 8B 05 ?? ?? ?? ?? 89 ??"
+
+    every token is a hex byte, a wildcard byte (? ?? * **) or a byte with a wildcard nibble (4? ?8),
+    the longest run of fixed bytes is searched with bytes.find and the whole mask is only checked
+    where it has been found
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        values = []
+        masks = []
+        for token in pattern.split():
+            if token in WILDCARDS:
+                values.append(0)
+                masks.append(0)
+            elif len(token) == 2:
+                value = mask = 0
+                for shift, nibble in ((4, token[0]), (0, token[1])):
+                    if nibble in "?*":
+                        continue
+                    try:
+                        value |= int(nibble, 16) << shift
+                    except ValueError:
+                        raise ValueError("invalid signature byte %r in %r" % (token, pattern))
+                    mask |= 0xF << shift
+                values.append(value)
+                masks.append(mask)
+            else:
+                raise ValueError("invalid signature byte %r in %r" % (token, pattern))
+
+        if not values:
+            raise ValueError("empty signature")
+
+        self.values = np.array(values, dtype=np.uint8)
+        self.masks = np.array(masks, dtype=np.uint8)
+
+        # the anchor is the longest run of fully known bytes
+        self.anchor = b""
+        self.anchor_offset = 0
+        start = None
+        for i, mask in enumerate(masks + [0]):
+            if mask == 0xFF and start is None:
+                start = i
+            elif mask != 0xFF and start is not None:
+                if i - start > len(self.anchor):
+                    self.anchor = bytes(values[start:i])
+                    self.anchor_offset = start
+                start = None
+
+        # bytes left to check once the anchor has been found
+        self.checks = [
+            k for k in range(len(values))
+            if masks[k] and not self.anchor_offset <= k < self.anchor_offset + len(self.anchor)
+        ]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "<Signature: %s>" % self.pattern
+
+    def find(self, b, address, end=None):
+        """
+        return a sorted array of the absolute addresses in b where the signature starts, signatures starting
+        at or after address + end are dropped
+        """
+        data = bytes(b) if not isinstance(b, bytes) else b
+        size = len(data) - len(self.values) + 1
+        if end is not None:
+            size = min(size, end)
+        if size <= 0:
+            return np.empty(0, dtype=np.uint64)
+
+        if self.anchor:
+            candidates = []
+            index = data.find(self.anchor, self.anchor_offset, size + self.anchor_offset + len(self.anchor) - 1)
+            while index != -1:
+                candidates.append(index - self.anchor_offset)
+                index = data.find(self.anchor, index + 1, size + self.anchor_offset + len(self.anchor) - 1)
+            candidates = np.array(candidates, dtype=np.intp)
+        else:
+            # nothing to anchor on, every position is a candidate
+            candidates = np.arange(size, dtype=np.intp)
+
+        array = np.frombuffer(data, dtype=np.uint8)
+        for k in self.checks:
+            if not len(candidates):
+                break
+            candidates = candidates[(array[candidates + k] & self.masks[k]) == self.values[k]]
+
+        return candidates.astype(np.uint64) + np.uint64(address)
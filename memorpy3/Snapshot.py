@@ -0,0 +1,108 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import hashlib
+import zlib
+
+import numpy as np
+
+from .utils import PAGE_SIZE
+
+
+class Snapshot:
+    """
+    compressed in-memory copy of the regions of a process, pages full of zeros are not stored
+    at all and identical pages are compressed and stored only once
+    """
+
+    def __init__(self, level=1):
+        self.level = level
+        self.bases = []
+        self.regions = []
+        self.blobs = {}
+        self.raw_size = 0
+
+    @classmethod
+    def take(cls, mw, level=1, **kwargs):
+        """ snapshot every region returned by mw.iter_chunks(**kwargs) """
+        snapshot = cls(level=level)
+        for offset, b in mw.iter_chunks(**kwargs):
+            snapshot.add_region(offset, b)
+        return snapshot
+
+    @property
+    def compressed_size(self):
+        return sum(len(blob) for blob in self.blobs.values())
+
+    def add_region(self, base, b):
+        """ store a region, pages are referenced by the digest of their content or None for zero pages """
+        size = len(b)
+        padded = np.zeros(-(-size // PAGE_SIZE) * PAGE_SIZE, dtype=np.uint8)
+        padded[:size] = np.frombuffer(b, dtype=np.uint8)
+        pages = padded.reshape(-1, PAGE_SIZE)
+        non_zero = pages.any(axis=1)
+
+        keys = []
+        for page, used in zip(pages, non_zero.tolist()):
+            if not used:
+                keys.append(None)
+                continue
+            data = page.tobytes()
+            key = hashlib.blake2b(data, digest_size=16).digest()
+            if key not in self.blobs:
+                self.blobs[key] = zlib.compress(data, self.level)
+            keys.append(key)
+
+        index = bisect.bisect_left(self.bases, base)
+        self.bases.insert(index, base)
+        self.regions.insert(index, (base, size, keys))
+        self.raw_size += size
+
+    def iter_regions(self):
+        """ yield (base, size) of every stored region """
+        for base, size, _ in self.regions:
+            yield base, size
+
+    def read(self, address, length):
+        """
+        return (buffer, known) where buffer holds length bytes from address and known is a per byte
+        mask telling which of them were part of the snapshot
+        """
+        buffer = np.zeros(length, dtype=np.uint8)
+        known = np.zeros(length, dtype=bool)
+        end = address + length
+
+        index = max(bisect.bisect_right(self.bases, address) - 1, 0)
+        for base, size, keys in self.regions[index:]:
+            if base >= end:
+                break
+            if base + size <= address:
+                continue
+
+            first = max(address, base)
+            last = min(end, base + size)
+            for page in range((first - base) // PAGE_SIZE, -(-(last - base) // PAGE_SIZE)):
+                page_start = base + page * PAGE_SIZE
+                start = max(page_start, first)
+                stop = min(page_start + PAGE_SIZE, last)
+                key = keys[page]
+                if key is not None:
+                    data = np.frombuffer(zlib.decompress(self.blobs[key]), dtype=np.uint8)
+                    buffer[start - address: stop - address] = data[start - page_start: stop - page_start]
+                known[start - address: stop - address] = True
+
+        return buffer, known
@@ -0,0 +1,213 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+On-disk memory snapshots, captured once from a live process and scanned offline.
+
+File layout:
+    - a PAGE_SIZE header: magic, format version, offset and length of the index
+    - the content of every region, each one starting on a page boundary
+    - the index, a json document listing the regions (with their file offset) and the modules
+"""
+
+import json
+import functools
+import mmap
+import struct
+import logging
+
+from .BaseProcess import BaseProcess, ProcessException
+from .RegionMap import Region, Module
+from .MemoryConstants import PAGE_READABLE
+from .utils import PAGE_SIZE
+
+logger = logging.getLogger("memorpy3")
+
+SNAPSHOT_MAGIC = b"MEMORPY3"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIQQ")
+
+SNAPSHOT_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def write_snapshot(process, path, protec=PAGE_READABLE, start_offset=None, end_offset=None,
+                   chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    stream every readable region of process to a snapshot file through a single reusable buffer,
+    return the number of regions written
+    """
+    buffer = memoryview(bytearray(chunk_size))
+    regions = []
+
+    with open(path, "wb") as f:
+        f.write(b"\x00" * PAGE_SIZE)
+
+        for region in process.region_map.filter(protec=protec, start=start_offset, end=end_offset):
+            file_offset = f.tell()
+            written = 0
+            while written < region.size:
+                length = min(chunk_size, region.size - written)
+                try:
+                    size = process.read_into(region.base + written, buffer[:length])
+                except Exception as e:
+                    logger.warning(e)
+                    size = 0
+                f.write(buffer[:size])
+                written += size
+                if size < length:
+                    # partial read, the end of the region is not readable
+                    break
+
+            if not written:
+                continue
+
+            regions.append({
+                "base": region.base,
+                "size": written,
+                "protect": region.protect,
+                "state": region.state,
+                "type": region.type,
+                "module": region.module,
+                "stack": region.stack,
+                "offset": file_offset,
+            })
+            # keep every region page aligned in the file
+            f.write(b"\x00" * (-f.tell() % PAGE_SIZE))
+
+        modules = [
+            {"name": m.name, "path": m.path, "base_addr": m.base_addr, "base_size": m.base_size}
+            for m in process.module_map.get_modules()
+        ]
+        index = json.dumps({
+            "pid": process.pid,
+            "is_64bit": process.is_64bit() if hasattr(process, "is_64bit") else True,
+            "regions": regions,
+            "modules": modules,
+        }).encode()
+
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, index_offset, len(index)))
+
+    return len(regions)
+
+
+class SnapshotProcess(BaseProcess):
+    """ read-only process served from a snapshot file, every read is a slice of a memory mapping """
+
+    def __init__(self, path):
+        super(SnapshotProcess, self).__init__()
+        self.path = path
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        magic, version, index_offset, index_length = SNAPSHOT_HEADER.unpack_from(self.mmap)
+        if magic != SNAPSHOT_MAGIC:
+            raise ProcessException("%s is not a memorpy3 snapshot" % path)
+        if version != SNAPSHOT_VERSION:
+            raise ProcessException("unsupported snapshot version %d" % version)
+
+        self.index = json.loads(bytes(self.view[index_offset: index_offset + index_length]))
+        self.offsets = {region["base"]: region["offset"] for region in self.index["regions"]}
+        self.pid = self.index["pid"]
+        self.h_process = None
+        self.isProcessOpen = True
+        # a snapshot never changes, walk it once
+        self.region_map.ttl = None
+
+    def close(self):
+        if self.isProcessOpen:
+            self.isProcessOpen = False
+            try:
+                self.view.release()
+                self.mmap.close()
+            except BufferError:
+                # views handed out by read_view are still alive, the mapping is released with them
+                pass
+            self.file.close()
+            return True
+        return False
+
+    def opener(self):
+        return functools.partial(type(self), self.path)
+
+    def is_64bit(self):
+        return self.index["is_64bit"]
+
+    def query_regions(self):
+        return [
+            Region(
+                base=region["base"],
+                size=region["size"],
+                protect=region["protect"],
+                state=region["state"],
+                type=region["type"],
+                module=region["module"],
+                stack=region.get("stack", False),
+            )
+            for region in self.index["regions"]
+        ]
+
+    def get_modules(self):
+        return {module["name"]: Module(**module) for module in self.index["modules"]}
+
+    def read_view(self, address, length):
+        """ return a memoryview of the snapshot file holding up to length bytes at address, without any copy """
+        if not self.isProcessOpen:
+            raise ProcessException("Can't read_view, snapshot %s is closed" % self.path)
+
+        address = int(address)
+        region = self.region_map.find(address)
+        if region is None:
+            raise ProcessException("0x%08X is not part of the snapshot" % address)
+
+        start = self.offsets[region.base] + address - region.base
+        return self.view[start: start + min(length, region.end - address)]
+
+    def read_bytes(self, address, length=4):
+        data = b""
+        address = int(address)
+        # a read may continue over the next region when they are contiguous
+        while length:
+            try:
+                chunk = self.read_view(address, length)
+            except ProcessException:
+                if data:
+                    break
+                raise
+            data += chunk
+            address += len(chunk)
+            length -= len(chunk)
+        return data
+
+    def read_into(self, address, buffer):
+        view = memoryview(buffer).cast("B")
+        size = 0
+        while size < len(view):
+            try:
+                chunk = self.read_view(int(address) + size, len(view) - size)
+            except ProcessException:
+                if size:
+                    break
+                raise
+            view[size: size + len(chunk)] = chunk
+            size += len(chunk)
+        return size
+
+    def write_bytes(self, address, data):
+        raise ProcessException("Can't write_bytes, snapshot %s is read-only" % self.path)
@@ -0,0 +1,188 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import codecs
+
+import numpy as np
+
+# bytes of the printable ASCII characters, like strings(1)
+PRINTABLE = np.zeros(256, dtype=bool)
+PRINTABLE[0x20:0x7F] = True
+PRINTABLE[ord("\t")] = True
+
+# encodings strings are extracted in, with the size of their characters
+STRING_UNITS = {"ascii": 1, "utf-16-le": 2, "utf-32-le": 4}
+
+
+class ChunkEdges:
+    """
+    the bytes at both ends of a chunk which may belong to strings crossing its boundaries, for every
+    (encoding, phase) the head ends before the first character which isn't printable and the tail
+    starts after the last one, open is True when the whole chunk is printable
+    """
+
+    __slots__ = ("offset", "size", "edges")
+
+    def __init__(self, offset, size, edges):
+        self.offset = offset
+        self.size = size
+        # {(encoding, phase): (start, head, tail_start, tail, open)}
+        self.edges = edges
+
+    def __reduce__(self):
+        return ChunkEdges, (self.offset, self.size, self.edges)
+
+
+class StringExtractor:
+    """
+    extract the strings of printable ASCII characters (in ascii, utf-16-le or utf-32-le) of at least
+    min_len characters from chunks of memory, like strings(1)
+
+    every character of a chunk is checked at once with numpy, for each alignment of the wider encodings,
+    and runs of printable characters are found from the edges of the mask. Strings lying entirely inside
+    a chunk are reported by scan, the ones touching its ends are joined by merge with the next chunk
+    """
+
+    def __init__(self, min_len=4, encodings=("ascii", "utf-16-le")):
+        if isinstance(encodings, str):
+            encodings = (encodings,)
+        if min_len < 1:
+            raise ValueError("min_len must be at least 1")
+
+        self.min_len = min_len
+        self.encodings = []
+        for encoding in encodings:
+            name = codecs.lookup(encoding).name
+            if name not in STRING_UNITS:
+                raise ValueError("can't extract %s strings, supported encodings are %s" % (encoding, ", ".join(STRING_UNITS)))
+            self.encodings.append(name)
+        self.keys = [(encoding, phase) for encoding in self.encodings for phase in range(STRING_UNITS[encoding])]
+
+    @staticmethod
+    def _mask(printable, zero, unit, start):
+        """ which characters of unit bytes from start are printable """
+        count = (len(printable) - start) // unit
+        mask = printable[start: start + count * unit: unit].copy()
+        for byte in range(1, unit):
+            mask &= zero[start + byte: start + byte + count * unit: unit]
+        return mask
+
+    @staticmethod
+    def _runs(mask):
+        """ return (starts, ends) of the runs of True of mask """
+        padded = np.zeros(len(mask) + 2, dtype=np.int8)
+        padded[1:-1] = mask
+        edges = np.diff(padded)
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    def _strings(self, data, address, encoding, starts, ends, first=0):
+        """ decode the runs of characters [starts, ends) of the characters starting at data[first] """
+        unit = STRING_UNITS[encoding]
+        long_enough = ends - starts >= self.min_len
+        return [
+            (address + start * unit, encoding, data[first + start * unit: first + end * unit].decode(encoding))
+            for start, end in zip(starts[long_enough].tolist(), ends[long_enough].tolist())
+        ]
+
+    def extract(self, data, address, encoding):
+        """ return the strings of data, starting with a character of encoding at address """
+        unit = STRING_UNITS[encoding]
+        array = np.frombuffer(data, dtype=np.uint8)
+        mask = self._mask(PRINTABLE[array], array == 0, unit, 0)
+        starts, ends = self._runs(mask)
+        return self._strings(data, address, encoding, starts, ends)
+
+    def scan(self, b, offset):
+        """
+        return the list of the strings of the chunk b read at offset as (address, encoding, text) tuples
+        sorted by address, preceded by the ChunkEdges of the chunk
+        """
+        data = bytes(b)
+        array = np.frombuffer(data, dtype=np.uint8)
+        printable = PRINTABLE[array]
+        zero = array == 0
+
+        edges = {}
+        strings = []
+        for encoding, phase in self.keys:
+            unit = STRING_UNITS[encoding]
+            start = (phase - offset) % unit
+            mask = self._mask(printable, zero, unit, start)
+            count = len(mask)
+            starts, ends = self._runs(mask)
+
+            if count == 0 or (len(starts) == 1 and starts[0] == 0 and ends[0] == count):
+                edges[(encoding, phase)] = (start, data, start, data, True)
+                continue
+
+            head_end = int(ends[0]) if len(starts) and starts[0] == 0 else 0
+            tail_start = int(starts[-1]) if len(starts) and ends[-1] == count else count
+            edges[(encoding, phase)] = (
+                start,
+                data[: start + head_end * unit],
+                start + tail_start * unit,
+                data[start + tail_start * unit:],
+                False,
+            )
+
+            inner = (starts > 0) & (ends < count)
+            strings += self._strings(data, offset + start, encoding, starts[inner], ends[inner], start)
+
+        strings.sort()
+        return [ChunkEdges(offset, len(data), edges)] + strings
+
+    def merge(self, results):
+        """
+        iterator returning (address, encoding, text) from the results of scan over consecutive chunks,
+        the strings crossing the boundary of two contiguous chunks are put back together
+        """
+        # {(encoding, phase): (address, bytes)} the tail of the previous chunk
+        pending = {}
+        for res in results:
+            if not isinstance(res, ChunkEdges):
+                yield res
+                continue
+
+            joined = []
+            for key, (start, head, tail_start, tail, is_open) in res.edges.items():
+                encoding = key[0]
+                previous = pending.pop(key, None)
+                if previous is not None and previous[0] + len(previous[1]) == res.offset:
+                    # the tail of the previous chunk ends where this chunk starts
+                    address, data = previous[0], previous[1] + head
+                else:
+                    if previous is not None:
+                        joined += self.extract(previous[1], previous[0], encoding)
+                    address, data = res.offset + start, head[start:]
+
+                if is_open:
+                    pending[key] = (address, data)
+                    continue
+                joined += self.extract(data, address, encoding)
+                if tail:
+                    pending[key] = (res.offset + tail_start, tail)
+
+            for string in sorted(joined):
+                yield string
+
+        for (encoding, _), (address, data) in pending.items():
+            for string in self.extract(data, address, encoding):
+                yield string
+
+
+def extractor_matcher(mw, extractor):
+    """ matcher of the scans run by ParallelScan """
+    return lambda b, offset, end=None: extractor.scan(b, offset)
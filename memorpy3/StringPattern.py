@@ -0,0 +1,93 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+# encodings a string is searched in by default
+STRING_ENCODINGS = ("ascii", "utf-8", "utf-16-le", "utf-32-le")
+
+
+class StringPattern:
+    """
+    a string encoded in several encodings and searched for in all of them at once, every encoding
+    is looked up in the same chunk with bytes.find so memory is read a single time
+
+    with ignore_case, the chunk and the encoded strings are lowered (ASCII letters only, a byte
+    operation) before the search, non ASCII letters are covered by searching the lower, upper and
+    capitalized forms of the string too, and every hit is checked by comparing its casefold() to the
+    casefold() of the string
+
+    encodings giving the same bytes (ascii and utf-8 for an ASCII string) are reported as the first of them
+    """
+
+    def __init__(self, text, encodings=STRING_ENCODINGS, ignore_case=False):
+        if isinstance(encodings, str):
+            encodings = (encodings,)
+        if not text:
+            raise ValueError("empty string")
+
+        self.text = text
+        self.ignore_case = ignore_case
+        self.folded = text.casefold()
+
+        forms = [text]
+        if ignore_case:
+            forms = list(dict.fromkeys([text, text.lower(), text.upper(), text.capitalize()]))
+
+        # {encoded string: encoding}
+        self.needles = {}
+        for encoding in encodings:
+            for form in forms:
+                try:
+                    needle = form.encode(encoding)
+                except UnicodeEncodeError:
+                    continue
+                if ignore_case:
+                    needle = needle.lower()
+                self.needles.setdefault(needle, encoding)
+        if not self.needles:
+            raise ValueError("%r can't be encoded in any of %s" % (text, ", ".join(encodings)))
+
+        self.encodings = list(dict.fromkeys(self.needles.values()))
+        self.min_length = min(len(needle) for needle in self.needles)
+        self.max_length = max(len(needle) for needle in self.needles)
+
+    def __len__(self):
+        return len(self.needles)
+
+    def find(self, b, end=None):
+        """
+        return the (position, encoding) of the occurrences of the string in b sorted by position,
+        occurrences starting at or after end are dropped
+        """
+        data = bytes(b)
+        haystack = data.lower() if self.ignore_case else data
+        end = len(data) if end is None else end
+
+        hits = {}
+        for needle, encoding in self.needles.items():
+            position = haystack.find(needle, 0, end + len(needle) - 1)
+            while position != -1:
+                if (position, encoding) not in hits and self._check(data, position, len(needle), encoding):
+                    hits[(position, encoding)] = None
+                position = haystack.find(needle, position + 1, end + len(needle) - 1)
+        return sorted(hits)
+
+    def _check(self, data, position, length, encoding):
+        if not self.ignore_case:
+            return True
+        try:
+            return data[position: position + length].decode(encoding).casefold() == self.folded
+        except UnicodeDecodeError:
+            return False
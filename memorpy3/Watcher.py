@@ -0,0 +1,224 @@
+# Author: Nicolas VERDIER
+# This file is part of memorpy.
+#
+# memorpy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# memorpy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import logging
+import threading
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from . import utils
+from .Address import Address
+from .ReadPlan import ReadPlan
+
+logger = logging.getLogger("memorpy3")
+
+# default polling interval, in seconds
+WATCH_INTERVAL = 1 / 60
+
+
+class WatchEvent(NamedTuple):
+    """a watched value has changed"""
+
+    # The Address whose value changed.
+    address: Address
+
+    # The previous value, None when it could not be read.
+    old: Any
+
+    # The new value, None when it can't be read anymore.
+    new: Any
+
+    # time.time() of the poll which noticed the change.
+    timestamp: float
+
+
+class Watcher:
+    """
+    poll a set of addresses from a background thread and report the values which changed, through
+    callbacks called as callback(event) and / or a queue.Queue receiving WatchEvent tuples
+
+    addresses are sorted and read with a few coalesced range reads, the raw bytes of every value are
+    compared to the previous poll at once with numpy and only the values which changed are decoded
+    """
+
+    def __init__(self, process, interval=WATCH_INTERVAL, callback=None, queue=None, gap=utils.PAGE_SIZE):
+        self.process = process
+        self.interval = interval
+        self.callbacks = [callback] if callback is not None else []
+        self.queue = queue
+        self.gap = gap
+        self.watches = {}
+        self.lock = threading.Lock()
+        self.plan = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.polls = 0
+
+    def add(self, address, data_type=None, size=50):
+        """
+        watch an Address (or an int) as data_type, its default_type when not given, strings and
+        bytes are watched on size bytes
+        """
+        if not isinstance(address, Address):
+            address = Address(address, self.process, default_type=data_type or "uint")
+        data_type = data_type or address.default_type
+        with self.lock:
+            self.watches[int(address)] = (address, data_type, size)
+            self._invalidate()
+        return address
+
+    def remove(self, address):
+        with self.lock:
+            self.watches.pop(int(address), None)
+            self._invalidate()
+
+    def _invalidate(self):
+        """ rebuild the plan at the next poll, keeping the last values read """
+        if self.plan is not None:
+            self.plan["stale"] = True
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def __len__(self):
+        return len(self.watches)
+
+    def _build_plan(self, previous=None):
+        """
+        sort the watches and plan the ranges to read, the last reading of the values already watched by
+        the previous plan is carried over
+        """
+        items = sorted(self.watches.values(), key=lambda watch: int(watch[0]))
+        if not items:
+            return {"items": []}
+        decoders = [utils.value_decoder(data_type, size) for _, data_type, size in items]
+        read_plan = ReadPlan([int(address) for address, _, _ in items], [size for size, _ in decoders], self.gap)
+
+        plan = {
+            "items": items,
+            "decoders": decoders,
+            "read_plan": read_plan,
+            "sizes": read_plan.sizes,
+            "starts": read_plan.starts,
+            # the values of the last poll, known is False for the values never read yet
+            "raw": np.zeros(int(read_plan.sizes.sum()), dtype=np.uint8),
+            "lengths": np.zeros(len(items), dtype=np.int64),
+            "known": np.zeros(len(items), dtype=bool),
+            "values": [None] * len(items),
+        }
+
+        if previous is not None and previous["items"]:
+            index = {
+                (int(item[0]), item[1], int(size)): i
+                for i, (item, size) in enumerate(zip(previous["items"], previous["sizes"]))
+            }
+            for i, (item, size) in enumerate(zip(items, read_plan.sizes.tolist())):
+                j = index.get((int(item[0]), item[1], size))
+                if j is None or not previous["known"][j]:
+                    continue
+                start, previous_start = plan["starts"][i], previous["starts"][j]
+                plan["raw"][start: start + size] = previous["raw"][previous_start: previous_start + size]
+                plan["lengths"][i] = previous["lengths"][j]
+                plan["known"][i] = True
+                plan["values"][i] = previous["values"][j]
+
+        return plan
+
+    def poll(self):
+        """ read every watched value once, report and return the list of WatchEvent for the values which changed """
+        with self.lock:
+            if self.plan is None or self.plan.get("stale"):
+                self.plan = self._build_plan(self.plan)
+            plan = self.plan
+        if not plan["items"]:
+            return []
+
+        raw, lengths = plan["read_plan"].read(self.process)
+        timestamp = time.time()
+
+        # values read for the first time are decoded without being reported
+        known = plan["known"]
+        changed = ~known
+        changed |= np.logical_or.reduceat(raw != plan["raw"], plan["starts"]) | (lengths != plan["lengths"])
+        plan["raw"] = raw
+        plan["lengths"] = lengths
+        self.polls += 1
+
+        events = []
+        values = plan["values"]
+        for i in np.flatnonzero(changed).tolist():
+            old = values[i]
+            size, decoder = plan["decoders"][i]
+            start = plan["starts"][i]
+            new = utils.decode_value(decoder, size, raw[start: start + lengths[i]].tobytes())
+            values[i] = new
+            if known[i] and old != new:
+                events.append(WatchEvent(plan["items"][i][0], old, new, timestamp))
+        known[:] = True
+
+        for event in events:
+            self._emit(event)
+        return events
+
+    def _emit(self, event):
+        if self.queue is not None:
+            self.queue.put(event)
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("watch callback failed on %r" % (event,))
+
+    def values(self):
+        """ return {address: value} as of the last poll """
+        plan = self.plan
+        if plan is None or not plan["items"]:
+            return {}
+        return {
+            int(item[0]): value for item, value, known in zip(plan["items"], plan["values"], plan["known"]) if known
+        }
+
+    def run(self):
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("watcher poll failed")
+            self.stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """ start polling from a background thread """
+        if self.thread is not None and self.thread.is_alive():
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="memorpy3-watcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
@@ -15,6 +15,7 @@
 # along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
 
 import copy
+import bisect
 import struct
 import platform
 
@@ -25,8 +26,8 @@ from ctypes import (
     sizeof,
     windll,
     c_bool,
-    c_uint32,
     c_ulong,
+    c_void_p,
     create_string_buffer,
     GetLastError,
     WinError
@@ -34,6 +35,8 @@ from ctypes import (
 
 from .WinStructures import *
 from .BaseProcess import BaseProcess, ProcessException
+from .RegionMap import Region
+from .MemoryConstants import MEM_FREE, MEM_PRIVATE, PAGE_EXECUTE_READWRITE, PAGE_WRITABLE
 from . import utils
 
 
@@ -237,37 +240,78 @@ class WinProcess(BaseProcess):
             )
         return old_protect.value
 
-    def iter_region(
-        self, start_offset=None, end_offset=None, protec=None, optimizations=None
-    ):
-
-        offset = start_offset or self.min_addr
-        end_offset = end_offset or self.max_addr
-
-        while True:
-            if offset >= end_offset:
-                break
+    def thread_stacks(self):
+        """ return the (limit, base) of the stack of every thread, read from their thread environment block """
+        stacks = []
+        h_thread_snap = CreateToolhelp32Snapshot(TH32CS_CLASS.SNAPTHREAD, 0)
+        if not h_thread_snap:
+            return stacks
+
+        # the TEB starts with a NT_TIB holding the base and the limit of the stack, the 32 bits TEB of
+        # a WoW64 process follows its native one
+        pointer_size = 8 if self.is_64bit() else 4
+        teb_offset = 0x2000 if sizeof(c_void_p) == 8 and pointer_size == 4 else 0
+        data_type = "ulonglong" if pointer_size == 8 else "uint"
+
+        thread_entry = THREADENTRY32()
+        thread_entry.dwSize = sizeof(thread_entry)
+        try:
+            success = Thread32First(h_thread_snap, byref(thread_entry))
+            while success:
+                if thread_entry.th32OwnerProcessID == self.pid:
+                    h_thread = OpenThread(THREAD_QUERY_INFORMATION, False, thread_entry.th32ThreadID)
+                    if h_thread:
+                        info = THREAD_BASIC_INFORMATION()
+                        status = NtQueryInformationThread(
+                            h_thread, ThreadBasicInformation, byref(info), sizeof(info), None
+                        )
+                        CloseHandle(h_thread)
+                        if status >= 0 and info.TebBaseAddress:
+                            teb = info.TebBaseAddress + teb_offset
+                            base, limit = self.read_many(
+                                [(teb + pointer_size, data_type), (teb + 2 * pointer_size, data_type)]
+                            )
+                            if base and limit:
+                                stacks.append((limit, base))
+                success = Thread32Next(h_thread_snap, byref(thread_entry))
+        finally:
+            CloseHandle(h_thread_snap)
+
+        return stacks
+
+    def query_regions(self):
+        modules = sorted(self.get_modules().values(), key=lambda m: m.base_addr)
+        module_bases = [m.base_addr for m in modules]
+        stacks = self.thread_stacks()
+
+        regions = []
+        offset = self.min_addr
+        while offset < self.max_addr:
             mbi = self.VirtualQueryEx(offset)
-            offset = mbi.BaseAddress
+            offset = mbi.BaseAddress or 0
             chunk = mbi.RegionSize
-            protect = mbi.Protect
-            state = mbi.State
-            # print "offset: %s, chunk:%s"%(offset, chunk)
-            if state & MEM_FREE or state & MEM_RESERVE:
-                offset += chunk
-                continue
-            if protec:
-                if (
-                    not protect & protec
-                    or protect & PAGE_NOCACHE
-                    or protect & PAGE_WRITECOMBINE
-                    or protect & PAGE_GUARD
-                ):
-                    offset += chunk
-                    continue
-            yield offset, chunk
+            if not mbi.State & MEM_FREE:
+                module = None
+                index = bisect.bisect_right(module_bases, offset) - 1
+                if index >= 0 and offset < modules[index].base_addr + modules[index].base_size:
+                    module = modules[index].name
+                regions.append(
+                    Region(
+                        base=offset,
+                        size=chunk,
+                        protect=mbi.Protect,
+                        state=mbi.State,
+                        type=mbi.Type,
+                        module=module,
+                        stack=mbi.Type == MEM_PRIVATE and any(
+                            offset < base and offset + chunk > limit for limit, base in stacks
+                        ),
+                    )
+                )
             offset += chunk
 
+        return regions
+
     def write_bytes(self, address, data):
         address = int(address)
         if not self.isProcessOpen:
@@ -275,27 +319,66 @@ class WinProcess(BaseProcess):
                 "Can't write_bytes(%s, %s), process %s is not open"
                 % (address, data, self.pid)
             )
-        buffer = create_string_buffer(data)
-        sizeWriten = c_size_t(0)
-        bufferSize = sizeof(buffer) - 1
-        _address = address
-        _length = bufferSize + 1
-        try:
-            old_protect = self.VirtualProtectEx(
-                _address, _length, PAGE_EXECUTE_READWRITE
-            )
-        except:
-            pass
+        return self.write_ranges([(address, data)])[0]
 
-        res = kernel32.WriteProcessMemory(
-            self.h_process, address, buffer, bufferSize, byref(sizeWriten)
-        )
-        try:
-            self.VirtualProtectEx(_address, _length, old_protect)
-        except:
-            pass
+    def write_ranges(self, ranges):
+        """
+        write many (address, data) ranges, return a list of booleans telling which writes succeeded
+
+        writes are grouped by region, the protection of a read-only region is changed once to cover all
+        its writes and restored once after them
+        """
+        if not self.isProcessOpen:
+            raise ProcessException(
+                "Can't write_ranges, process %s is not open" % self.pid
+            )
 
-        return res
+        status = [True] * len(ranges)
+        # split the writes on the regions they span, a protection change never covers two regions
+        regions = {}
+        unknown = []
+        for index, (address, data) in enumerate(ranges):
+            address = int(address)
+            data = bytes(data)
+            offset = 0
+            while offset < len(data):
+                region = self.region_map.find(address + offset)
+                if region is None:
+                    unknown.append((address + offset, data[offset:], index))
+                    break
+                length = min(len(data) - offset, region.end - (address + offset))
+                regions.setdefault(region.base, (region, []))[1].append(
+                    (address + offset, data[offset: offset + length], index)
+                )
+                offset += length
+
+        groups = [(region, writes) for region, writes in regions.values()]
+        # writes out of the known regions get their own protection change
+        groups += [(None, [write]) for write in unknown]
+
+        for region, writes in groups:
+            start = min(address for address, _, _ in writes)
+            end = max(address + len(data) for address, data, _ in writes)
+            old_protect = None
+            if region is None or not region.protect & PAGE_WRITABLE:
+                try:
+                    old_protect = self.VirtualProtectEx(start, end - start, PAGE_EXECUTE_READWRITE)
+                except ProcessException:
+                    pass
+
+            for address, data, index in writes:
+                written = c_size_t(0)
+                if not WriteProcessMemory(self.h_process, address, data, len(data), byref(written)) \
+                        or written.value != len(data):
+                    status[index] = False
+
+            if old_protect is not None:
+                try:
+                    self.VirtualProtectEx(start, end - start, old_protect)
+                except ProcessException:
+                    pass
+
+        return status
 
     def read_bytes(self, address, length: int = 4, use_NtWow64ReadVirtualMemory64: bool = False):
         # print(f"reading {length} bytes from address {address}")
@@ -340,6 +423,25 @@ class WinProcess(BaseProcess):
 
         return data
 
+    def read_into(self, address, buffer):
+        address = int(address)
+        target = utils.ctypes_buffer(buffer)
+        if not len(target):
+            return 0
+
+        bytes_read = c_size_t(0)
+        if ReadProcessMemory(self.h_process, address, target, len(target), byref(bytes_read)) or (
+            GetLastError() == 299  # only part of ReadProcessMemory has been done, keep it
+        ):
+            if not bytes_read.value:
+                raise ProcessException(
+                    "Error %s in ReadProcessMemory(%08x, %d, read=%d)"
+                    % (GetLastError(), address, len(target), bytes_read.value)
+                )
+            return bytes_read.value
+
+        raise WinError()
+
     def get_modules(self) -> dict[ModuleEntry32]:
         modules: dict[ModuleEntry32] = {}
 
@@ -358,7 +460,8 @@ class WinProcess(BaseProcess):
                         module_id=module_entry.th32ModuleID,
                         process_id=module_entry.th32ProcessID,
                         handle=module_entry.hModule,
-                        base_addr=(cast(pointer(module_entry.modBaseAddr), POINTER(c_uint32))).contents.value,
+                        # modBaseAddr is a pointer, read it whole, a 32 bits cast truncates the bases of x64 modules
+                        base_addr=cast(module_entry.modBaseAddr, c_void_p).value or 0,
                         base_size=module_entry.modBaseSize,
                         dw_size=module_entry.dwSize,
                         load_count=module_entry.ProccntUsage,
@@ -369,18 +472,10 @@ class WinProcess(BaseProcess):
 
         return modules
 
-    def get_symbolic_name(self, address):
-        for m in self.get_modules().values():
-            if m.base_addr <= int(address) < m.base_addr + m.base_size:
-                return '%s+0x%08X' % (m.name, int(address) - m.base_addr)
-
-        return '0x%08X' % int(address)
-
     def has_module(self, module):
         if module[-4:] != ".dll":
             module += ".dll"
-        module_list = self.get_modules()
-        for m in module_list:
+        for m in self.module_map.get_modules():
             if module in m.path.split("\\"):
                 return True
         return False
@@ -35,6 +35,8 @@ from ctypes import (
 from ctypes.wintypes import *
 from dataclasses import dataclass
 
+from .MemoryConstants import *
+
 if sizeof(c_void_p) == 8:
     ULONG_PTR = c_ulonglong
 else:
@@ -187,6 +189,24 @@ class TH32CS_CLASS(object):
     ALL = 2032639
 
 
+class CLIENT_ID(Structure):
+    _fields_ = [("UniqueProcess", c_void_p), ("UniqueThread", c_void_p)]
+
+
+class THREAD_BASIC_INFORMATION(Structure):
+    _fields_ = [
+        ("ExitStatus", c_long),
+        ("TebBaseAddress", c_void_p),
+        ("ClientId", CLIENT_ID),
+        ("AffinityMask", ULONG_PTR),
+        ("Priority", c_long),
+        ("BasePriority", c_long),
+    ]
+
+
+THREAD_QUERY_INFORMATION = 0x40
+ThreadBasicInformation = 0
+
 Module32First = windll.kernel32.Module32First
 Module32First.argtypes = [c_void_p, POINTER(MODULEENTRY32)]
 Module32First.rettype = c_int
@@ -205,6 +225,21 @@ CreateToolhelp32Snapshot = windll.kernel32.CreateToolhelp32Snapshot
 CreateToolhelp32Snapshot.reltype = c_long
 CreateToolhelp32Snapshot.argtypes = [c_int, c_int]
 
+Thread32First = windll.kernel32.Thread32First
+Thread32First.argtypes = [c_void_p, POINTER(THREADENTRY32)]
+Thread32First.restype = BOOL
+Thread32Next = windll.kernel32.Thread32Next
+Thread32Next.argtypes = [c_void_p, POINTER(THREADENTRY32)]
+Thread32Next.restype = BOOL
+
+OpenThread = windll.kernel32.OpenThread
+OpenThread.argtypes = [DWORD, BOOL, DWORD]
+OpenThread.restype = HANDLE
+
+NtQueryInformationThread = windll.ntdll.NtQueryInformationThread
+NtQueryInformationThread.argtypes = [HANDLE, c_int, c_void_p, c_ulong, POINTER(c_ulong)]
+NtQueryInformationThread.restype = c_long
+
 CloseHandle = windll.kernel32.CloseHandle
 CloseHandle.argtypes = [c_void_p]
 CloseHandle.rettype = c_int
@@ -248,17 +283,6 @@ VirtualQueryEx.restype = c_size_t
 # VirtualQueryEx64.argtypes = [HANDLE, LPCVOID, POINTER(MEMORY_BASIC_INFORMATION64), c_size_t]
 # VirtualQueryEx64.restype = c_size_t
 
-PAGE_EXECUTE_READWRITE = 64
-PAGE_EXECUTE_READ = 32
-PAGE_READONLY = 2
-PAGE_READWRITE = 4
-PAGE_NOCACHE = 512
-PAGE_WRITECOMBINE = 1024
-PAGE_GUARD = 256
-
-MEM_COMMIT = 4096
-MEM_FREE = 65536
-MEM_RESERVE = 8192
 
 UNPROTECTED_DACL_SECURITY_INFORMATION = 536870912
 DACL_SECURITY_INFORMATION = 4
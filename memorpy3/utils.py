@@ -15,15 +15,84 @@
 # along with memorpy.  If not, see <http://www.gnu.org/licenses/>.
 
 import re
+import ctypes
 import struct
 
+import numpy as np
 
-def re_to_unicode(s):
-    new_string = ""
-    for c in s:
-        new_string += re.escape(c) + "\\x00"
+PAGE_SIZE = 0x1000
+
+
+def coalesce_spans(addresses, sizes, gap=PAGE_SIZE, max_read=1 << 20):
+    """
+    split sorted addresses of values of sizes bytes into groups read with a single call, return a list
+    of (start, length, first, last) where the values first to last - 1 all fit in [start, start + length)
+
+    two values are only merged when less than gap bytes separate them, with gap <= PAGE_SIZE a
+    group never spans a page which held no value, and a group only grows over max_read bytes when
+    a single value is that large
+    """
+    if not len(addresses):
+        return []
+
+    addresses = np.asarray(addresses, dtype=np.uint64)
+    # values may overlap or contain each other, a group ends at the furthest end seen so far
+    ends = np.maximum.accumulate(addresses + np.asarray(sizes, dtype=np.uint64))
+    breaks = np.flatnonzero(addresses[1:] > ends[:-1] + np.uint64(gap)) + 1
+    bounds = [0] + breaks.tolist() + [len(addresses)]
+
+    groups = []
+    for first, last in zip(bounds, bounds[1:]):
+        while first < last:
+            start = int(addresses[first])
+            # cut the group before it grows over max_read
+            cut = first + int(np.searchsorted(ends[first:last], np.uint64(start + max_read), side="right"))
+            cut = max(cut, first + 1)
+            groups.append((start, int(ends[cut - 1]) - start, first, cut))
+            first = cut
+
+    return groups
+
+
+def coalesce_ranges(addresses, size, gap=PAGE_SIZE, max_read=1 << 20):
+    """ coalesce_spans for values all of size bytes """
+    return coalesce_spans(addresses, np.full(len(addresses), size, dtype=np.uint64), gap, max_read)
 
-    return new_string
+
+def merge_writes(writes):
+    """
+    merge adjacent and overlapping (address, data) writes, where writes overlap the last one of the list wins,
+    return a list of (address, data, indexes) where indexes are the positions of the writes merged together
+    """
+    order = sorted(range(len(writes)), key=lambda i: int(writes[i][0]))
+    groups = []
+    for i in order:
+        address = int(writes[i][0])
+        end = address + len(writes[i][1])
+        if groups and address <= groups[-1][1]:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append(i)
+        else:
+            groups.append([address, end, [i]])
+
+    merged = []
+    for start, end, indexes in groups:
+        indexes.sort()
+        if len(indexes) == 1:
+            merged.append((start, bytes(writes[indexes[0]][1]), indexes))
+            continue
+        buffer = bytearray(end - start)
+        for i in indexes:
+            address, data = writes[i]
+            buffer[int(address) - start: int(address) - start + len(data)] = data
+        merged.append((start, bytes(buffer), indexes))
+
+    return merged
+
+
+def re_to_unicode(s):
+    """ bytes regex matching the string s encoded in utf-16-le """
+    return re.escape(s.encode("utf-16-le"))
 
 
 def type_unpack(data_type):
@@ -38,6 +107,8 @@ def type_unpack(data_type):
         'uint':   ('I', 4),
         'long':   ('l', 4),
         'ulong':  ('L', 4),
+        'longlong':  ('q', 8),
+        'ulonglong': ('Q', 8),
         'float':  ('f', 4),
         'double': ('d', 8),
     }
@@ -49,6 +120,234 @@ def type_unpack(data_type):
     raise TypeError(f'Unknown data type: {data_type}')
 
 
+def value_decoder(data_type, max_len=50):
+    """
+    return (size, decoder) to decode values of data_type: a type name ('int', 'float' ...), 'string',
+    'bytes' (max_len bytes) or a number of bytes
+    """
+    if isinstance(data_type, int):
+        return data_type, None
+    if data_type in ('s', 'string'):
+        return max_len, 'string'
+    if data_type in ('b', 'bytes'):
+        return max_len, None
+
+    struct_type, struct_len = type_unpack(data_type)
+    return struct_len, struct.Struct(struct_type)
+
+
+def decode_value(decoder, size, data, encoding='utf-8'):
+    """ decode data read for a value_decoder, return None when too few bytes have been read """
+    if isinstance(decoder, struct.Struct):
+        if len(data) < size:
+            return None
+        return decoder.unpack_from(data)[0]
+    if not data:
+        return None
+    if decoder == 'string':
+        return bytes(data).split(b'\x00', 1)[0].decode(encoding, 'ignore')
+    return bytes(data)
+
+
+def type_dtype(data_type):
+    """ return the numpy dtype of a particular type """
+    data_type = data_type.lower()
+
+    dtypes = {
+        'short':  '<i2',
+        'ushort': '<u2',
+        'int':    '<i4',
+        'uint':   '<u4',
+        'long':   '<i4',
+        'ulong':  '<u4',
+        'longlong':  '<i8',
+        'ulonglong': '<u8',
+        'float':  '<f4',
+        'double': '<f8',
+    }
+
+    if data_type in dtypes:
+        return np.dtype(dtypes[data_type])
+
+    raise TypeError(f'Unknown data type: {data_type}')
+
+
+PREDICATES = ('changed', 'unchanged', 'increased', 'decreased', 'increased_by', 'decreased_by', 'in_range')
+
+
+def compare_values(predicate, old, new, value=None, epsilon=None):
+    """
+    return the mask of the positions where new satisfies predicate against old,
+    increased_by / decreased_by take the delta as value and in_range takes a [lo, hi] pair
+    """
+    if predicate == 'changed':
+        return old.view(uint_dtype(old.itemsize)) != new.view(uint_dtype(new.itemsize))
+    elif predicate == 'unchanged':
+        return old.view(uint_dtype(old.itemsize)) == new.view(uint_dtype(new.itemsize))
+    elif predicate == 'increased':
+        return new > old
+    elif predicate == 'decreased':
+        return new < old
+    elif predicate == 'in_range':
+        lo, hi = value
+        return (new >= lo) & (new <= hi)
+    elif predicate in ('increased_by', 'decreased_by'):
+        if predicate == 'decreased_by':
+            value = -value
+        if new.dtype.kind == 'f':
+            with np.errstate(invalid='ignore', over='ignore'):
+                return np.abs((new - old) - value) <= (epsilon or 0)
+        return new.astype(np.int64) - old.astype(np.int64) == value
+
+    raise ValueError(f'Unknown predicate: {predicate}, expected one of {", ".join(PREDICATES)}')
+
+
+def ctypes_buffer(buffer):
+    """ return a ctypes char array sharing the memory of a writable buffer (bytearray, memoryview, numpy array) """
+    view = memoryview(buffer).cast("B")
+    return (ctypes.c_char * len(view)).from_buffer(view)
+
+
+def uint_dtype(size):
+    """ return the little endian unsigned numpy dtype of a particular size, used to compare raw values """
+    dtypes = {1: '<u1', 2: '<u2', 4: '<u4', 8: '<u8'}
+
+    if size in dtypes:
+        return np.dtype(dtypes[size])
+
+    raise TypeError(f'No unsigned dtype of size {size}')
+
+
+def float_dtype(data_type):
+    """ return the numpy dtype of a floating point type """
+    dtypes = {'float': '<f4', 'double': '<f8'}
+    data_type = data_type.lower()
+
+    if data_type in dtypes:
+        return np.dtype(dtypes[data_type])
+
+    raise TypeError(f'Not a floating point type: {data_type}')
+
+
+class FloatRange:
+    """
+    inclusive [lo, hi] interval searched by float and double scans, a tuple or a list of values
+    stays a pattern of consecutive values which float types don't search
+    """
+
+    def __init__(self, lo, hi):
+        if lo > hi:
+            raise ValueError(f'Empty float range: [{lo}, {hi}]')
+        self.lo = lo
+        self.hi = hi
+
+    def __eq__(self, other):
+        return isinstance(other, FloatRange) and (self.lo, self.hi) == (other.lo, other.hi)
+
+    def __hash__(self):
+        return hash((FloatRange, self.lo, self.hi))
+
+    def __repr__(self):
+        return f'FloatRange({self.lo!r}, {self.hi!r})'
+
+
+def float_bounds(value, data_type, epsilon=None):
+    """
+    return the inclusive (lo, hi) interval matched by a float search, value is either a number
+    matched within +/- epsilon (exactly at the type precision when epsilon is None) or a FloatRange,
+    raise ValueError for a pattern of several values
+    """
+    dtype = float_dtype(data_type)
+
+    if isinstance(value, FloatRange):
+        lo, hi = value.lo, value.hi
+    elif isinstance(value, (tuple, list)):
+        raise ValueError(f'{data_type} values are not searched as a pattern, use FloatRange(lo, hi) for a range')
+    elif epsilon:
+        lo, hi = value - abs(epsilon), value + abs(epsilon)
+    else:
+        lo = hi = value
+
+    return dtype.type(lo), dtype.type(hi)
+
+
+def strided_view(b, dtype, offset, stride):
+    """ view b as an array of dtype starting at offset with one item every stride bytes """
+    dtype = np.dtype(dtype)
+    count = (len(b) - offset - dtype.itemsize) // stride + 1
+    if offset >= len(b) or count <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.ndarray(shape=(count,), dtype=dtype, buffer=b, offset=offset, strides=(stride,))
+
+
+def iter_aligned_views(b, dtype, address, alignment=None):
+    """
+    yield (offset, stride, view) triplets covering every position of b holding a value of dtype,
+    restricted to absolute addresses multiple of alignment when it is given
+    """
+    itemsize = np.dtype(dtype).itemsize
+    alignment = alignment or 1
+    # one view per phase, each phase being a multiple of alignment
+    stride = alignment * -(-itemsize // alignment)
+    first = (-address) % alignment
+    for offset in range(first, first + stride, alignment):
+        yield offset, stride, strided_view(b, dtype, offset, stride)
+
+
+def find_values(b, target, dtype, address, alignment=None):
+    """ return a sorted array of the absolute addresses in b where dtype == target """
+    hits = []
+    for offset, stride, view in iter_aligned_views(b, dtype, address, alignment):
+        if len(view):
+            hits.append(np.flatnonzero(view == target).astype(np.uint64) * stride + (address + offset))
+
+    if not hits:
+        return np.empty(0, dtype=np.uint64)
+    return np.sort(np.concatenate(hits))
+
+
+def clip_hits(hits, address, end=None):
+    """ drop the hits starting at or after address + end, they belong to the next chunk """
+    if end is None:
+        return hits
+    return hits[hits < address + end]
+
+
+def find_bytes(b, pattern, address, alignment=None):
+    """
+    return a sorted array of the absolute addresses in b where the pattern starts, b is any bytes-like object
+    (a memoryview is copied once so bytes.find can be used), overlapping occurrences are all reported
+    """
+    data = b if isinstance(b, bytes) else bytes(b)
+    pattern = bytes(pattern)
+    if not pattern or len(data) < len(pattern):
+        return np.empty(0, dtype=np.uint64)
+
+    positions = []
+    index = data.find(pattern)
+    while index != -1:
+        positions.append(index)
+        index = data.find(pattern, index + 1)
+
+    hits = np.array(positions, dtype=np.uint64) + np.uint64(address)
+    if alignment:
+        hits = hits[hits % np.uint64(alignment) == 0]
+    return hits
+
+
+def find_in_range(b, lo, hi, dtype, address, alignment=None):
+    """ return a sorted array of the absolute addresses in b where lo <= dtype <= hi, NaN never match """
+    hits = []
+    for offset, stride, view in iter_aligned_views(b, dtype, address, alignment):
+        if len(view):
+            mask = (view >= lo) & (view <= hi)
+            hits.append(np.flatnonzero(mask).astype(np.uint64) * stride + (address + offset))
+
+    if not hits:
+        return np.empty(0, dtype=np.uint64)
+    return np.sort(np.concatenate(hits))
+
+
 def hex_dump(data, address=0, prefix="", ftype="bytes"):
     """
     function originally from pydbg, modified to display other types
@@ -43,8 +43,8 @@ setup(
     include_package_data=True,
     zip_safe=False,
     packages=["memorpy3"],
-    install_requires=[],
-    platforms=["Windows"],
+    install_requires=["numpy"],
+    platforms=["Windows", "Linux"],
     long_description=open("README.md").read(),
     long_description_content_type='text/markdown',
     classifiers=[